@@ -0,0 +1,71 @@
+"""
+Benchmarks BatchedCatanEnv against CatanEnv with uniformly random legal actions,
+and the cost of live streaming (src/env/streaming.py) on CatanEnv.
+
+Usage: python bench_batched_engine.py [n_envs] [seconds]
+"""
+import socket
+import sys
+import time
+
+import numpy as np
+
+from src.env.catan_env import CatanEnv
+from src.env.batched_engine import BatchedCatanEnv
+
+MAX_TURNS = 1000  # catanatron's TURNS_LIMIT
+
+
+def random_actions(rng, mask):
+    keys = np.where(mask == 1, rng.random(mask.shape), -1.0)
+    return np.argmax(keys, axis=-1)
+
+
+def bench_catanatron(seconds, config=None):
+    env = CatanEnv(config)
+    rng = np.random.default_rng(0)
+    env.reset()
+    steps = games = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        _, _, terminated, _, _ = env.step(random_actions(rng, env.get_valid_actions_mask()))
+        steps += 1
+        if terminated or env.game.state.num_turns >= MAX_TURNS:
+            games += 1
+            env.reset()
+    elapsed = time.perf_counter() - start
+    env.close()
+    return steps / elapsed, games / elapsed
+
+
+def bench_batched(n_envs, seconds):
+    env = BatchedCatanEnv(n_envs, config={"max_turns": MAX_TURNS}, seed=0)
+    rng = np.random.default_rng(0)
+    env.reset()
+    steps = games = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        _, _, terminated, truncated, _ = env.step(random_actions(rng, env.get_valid_actions_mask()))
+        steps += n_envs
+        games += int((terminated | truncated).sum())
+    elapsed = time.perf_counter() - start
+    return steps / elapsed, games / elapsed
+
+
+if __name__ == "__main__":
+    n_envs = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 20.0
+
+    sps, gps = bench_catanatron(seconds)
+    print(f"CatanEnv (catanatron):      {sps:10.0f} steps/s  {gps:8.2f} games/s")
+    # Frames go to a local socket nobody reads, as to a hub that can't keep up
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(("127.0.0.1", 0))
+    stream = "127.0.0.1:%d" % sink.getsockname()[1]
+    sps, gps = bench_catanatron(seconds, {"stream": stream})
+    print(f"  + stream every game:      {sps:10.0f} steps/s  {gps:8.2f} games/s")
+    sps, gps = bench_catanatron(seconds, {"stream": stream, "stream_every_n_games": 10})
+    print(f"  + stream every 10th game: {sps:10.0f} steps/s  {gps:8.2f} games/s")
+    sink.close()
+    sps, gps = bench_batched(n_envs, seconds)
+    print(f"BatchedCatanEnv (B={n_envs:4d}): {sps:10.0f} steps/s  {gps:8.2f} games/s")
@@ -0,0 +1,192 @@
+"""
+MaskablePPO that learns from every seat's decisions.
+
+Needs envs in CatanEnv's multi-agent mode (config={"multi_agent": True}):
+each step's observation belongs to the seat about to act (info["seat"]),
+and info["seat_rewards"] carries the reward every seat received.
+
+Every (env, seat) pair keeps its own chain of transitions. A seat's
+transition runs from one of its decisions to its next one (or to the end
+of the game), and its reward is everything that seat received in between,
+including from opponents' moves. GAE runs along each seat's chain, so a
+seat bootstraps from its own next decision, never from another seat's value.
+
+A rollout collects env steps until n_steps * n_envs transitions have
+finished (the usual PPO budget), then packs them into the standard
+(n_steps, n_envs) buffer with their precomputed advantages. Only each
+seat's latest, still-open decision carries over into the next rollout;
+transitions finishing beyond the budget on the last step are dropped.
+"""
+import numpy as np
+import torch as th
+from gymnasium import spaces
+from sb3_contrib.common.maskable.utils import get_action_masks, is_masking_supported
+from sb3_contrib.ppo_mask import MaskablePPO
+from stable_baselines3.common.utils import obs_as_tensor
+
+N_SEATS = 4
+
+
+class AllSeatMaskablePPO(MaskablePPO):
+    """MaskablePPO whose rollouts hold decisions of all 4 seats of every env."""
+
+    def _setup_model(self):
+        super()._setup_model()
+        self._reset_seat_state()
+
+    def _reset_seat_state(self):
+        n_columns = self.n_envs * N_SEATS
+        self._columns = [[] for _ in range(n_columns)]  # finished transitions of this rollout
+        self._pending = [None] * n_columns  # each seat's latest decision, still collecting reward
+        self._seat_starts = np.ones(n_columns, dtype=bool)  # next decision starts that seat's episode
+        self._seats = None  # acting seat per env for self._last_obs
+
+    def _excluded_save_params(self):
+        return super()._excluded_save_params() + ["_columns", "_pending", "_seat_starts", "_seats"]
+
+    def _setup_learn(self, total_timesteps, callback=None, reset_num_timesteps=True, tb_log_name="run",
+                     progress_bar=False):
+        if self._seats is None:
+            # Acting seats of a restored _last_obs are unknown; start fresh games
+            self._last_obs = None
+        env_reset = reset_num_timesteps or self._last_obs is None
+        result = super()._setup_learn(total_timesteps, callback, reset_num_timesteps, tb_log_name, progress_bar)
+        if env_reset:
+            # Transitions still held belong to the games that were just abandoned
+            self._reset_seat_state()
+            self._seats = np.array([info["seat"] for info in self.env.reset_infos], dtype=np.int64)
+        return result
+
+    def collect_rollouts(self, env, callback, rollout_buffer, n_rollout_steps, use_masking=True):
+        assert self._last_obs is not None, "No previous observation was provided"
+        self.policy.set_training_mode(False)
+        rollout_buffer.reset()
+
+        if use_masking and not is_masking_supported(env):
+            raise ValueError("Environment does not support action masking. Consider using ActionMasker wrapper")
+
+        callback.on_rollout_start()
+
+        n_envs = env.num_envs
+        n_transitions = n_rollout_steps * n_envs
+        n_finished = 0
+        n_steps = 0
+        action_masks = None
+        while n_finished < n_transitions:
+            with th.no_grad():
+                obs_tensor = obs_as_tensor(self._last_obs, self.device)
+                if use_masking:
+                    action_masks = get_action_masks(env)
+                actions, values, log_probs = self.policy(obs_tensor, action_masks=action_masks)
+
+            actions = actions.cpu().numpy()
+            new_obs, _, dones, infos = env.step(actions)
+
+            self.num_timesteps += n_envs
+            n_steps += 1
+
+            # Give access to local variables
+            callback.update_locals(locals())
+            if not callback.on_step():
+                return False
+
+            self._update_info_buffer(infos, dones)
+
+            for i in range(n_envs):
+                column = i * N_SEATS + self._seats[i]
+                # The seat acting again closes its previous transition
+                if self._pending[column] is not None:
+                    self._pending[column]["step"] = n_steps
+                    self._columns[column].append(self._pending[column])
+                    n_finished += 1
+                self._pending[column] = {
+                    "obs": {k: v[i] for k, v in self._last_obs.items()},
+                    "action": actions[i],
+                    "value": values[i],
+                    "log_prob": log_probs[i],
+                    "action_mask": None if action_masks is None else action_masks[i],
+                    "episode_start": self._seat_starts[column],
+                    "reward": 0.0,
+                }
+                self._seat_starts[column] = False
+
+                seat_rewards = infos[i]["seat_rewards"]
+                for seat in range(N_SEATS):
+                    pending = self._pending[i * N_SEATS + seat]
+                    if pending is not None:
+                        pending["reward"] += float(seat_rewards[seat])
+
+                if dones[i]:
+                    # Game over: every seat's last decision is terminal
+                    for seat in range(N_SEATS):
+                        c = i * N_SEATS + seat
+                        if self._pending[c] is not None:
+                            self._pending[c]["step"] = n_steps
+                            self._columns[c].append(self._pending[c])
+                            self._pending[c] = None
+                            n_finished += 1
+                        self._seat_starts[c] = True
+                    self._seats[i] = env.reset_infos[i]["seat"]
+                else:
+                    self._seats[i] = infos[i]["seat"]
+
+            self._last_obs = new_obs
+            self._last_episode_starts = dones
+
+        self._fill_buffer(rollout_buffer, n_transitions)
+
+        callback.update_locals(locals())
+        callback.on_rollout_end()
+
+        return True
+
+    def _seat_advantages(self):
+        """GAE along each seat's chain, bootstrapped from that seat's next decision."""
+        for column, following in zip(self._columns, self._pending):
+            if following is None or following["episode_start"]:
+                next_value, next_start = 0.0, True
+            else:
+                next_value, next_start = float(following["value"]), False
+            gae = 0.0
+            for transition in reversed(column):
+                value = float(transition["value"])
+                non_terminal = 0.0 if next_start else 1.0
+                delta = transition["reward"] + self.gamma * next_value * non_terminal - value
+                gae = delta + self.gamma * self.gae_lambda * non_terminal * gae
+                transition["advantage"] = gae
+                transition["return"] = gae + value
+                next_value, next_start = value, transition["episode_start"]
+
+    def _fill_buffer(self, rollout_buffer, n_transitions):
+        """Packs the first n_transitions finished transitions into the buffer."""
+        self._seat_advantages()
+        finished = sorted((t for column in self._columns for t in column), key=lambda t: t["step"])
+        self._columns = [[] for _ in self._columns]
+
+        n_envs = rollout_buffer.n_envs
+        advantages = np.zeros((rollout_buffer.buffer_size, n_envs), dtype=np.float32)
+        returns = np.zeros_like(advantages)
+        for row in range(rollout_buffer.buffer_size):
+            entries = finished[row * n_envs:(row + 1) * n_envs]
+            obs = {k: np.stack([e["obs"][k] for e in entries]) for k in entries[0]["obs"]}
+            actions = np.array([e["action"] for e in entries])
+            if isinstance(self.action_space, spaces.Discrete):
+                actions = actions.reshape(-1, 1)
+            masks = None
+            if entries[0]["action_mask"] is not None:
+                masks = np.stack([e["action_mask"] for e in entries])
+            rollout_buffer.add(
+                obs,
+                actions,
+                np.array([e["reward"] for e in entries], dtype=np.float32),
+                np.array([e["episode_start"] for e in entries], dtype=np.float32),
+                th.stack([e["value"] for e in entries]),
+                th.stack([e["log_prob"] for e in entries]),
+                action_masks=masks,
+            )
+            advantages[row] = [e["advantage"] for e in entries]
+            returns[row] = [e["return"] for e in entries]
+
+        # Stands in for compute_returns_and_advantage, which would run GAE across packed columns
+        rollout_buffer.advantages = advantages
+        rollout_buffer.returns = returns
@@ -0,0 +1,380 @@
+"""
+Parallel hyperparameter sweep for train_ppo.py with successive halving.
+
+Samples trial configs from a search space, trains each for a short budget
+in a process pool sized to the machine, evaluates them, keeps the best
+1/eta and continues those with eta times the budget (resuming from their
+saved model). At least one trial runs through every rung. Every evaluation
+is appended to a JSON-lines results store.
+
+Besides the evaluation metric, each trial records its reward curve over the
+rung: the mean per-step reward of its last rollouts ("rollout_reward") and
+that curve's slope per rollout ("reward_slope"). Both exist even when no
+episode finished within the budget, so they separate trials whose win rates
+tie (typically all 0.0 early on).
+
+Cores are split between trials and their vector envs: a trial reserves one
+core per env subprocess (its n_envs) plus one for its learner process (a
+single-env trial steps its env in the learner and reserves one core), and
+trials are only launched while reserved cores fit within --cores. n_envs
+is capped so a single trial fits.
+
+All trials are evaluated on the same games (seeded by --seed, optionally on
+the fixed boards of --layout-pool), so win rates differ by policy, not by
+board luck.
+
+Usage:
+    python src/agent/sweep.py --trials 27 --min-timesteps 50000 --eta 3 --rungs 3
+    python src/agent/sweep.py --space my_space.json --out sweeps/lr_search
+"""
+import argparse
+import concurrent.futures
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+# Ensure src is in path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+# Search space: name -> ["choice", [values]] | ["uniform", lo, hi] | ["loguniform", lo, hi]
+# Parameters left out keep their train_ppo.DEFAULT_HPARAMS value.
+DEFAULT_SEARCH_SPACE = {
+    "n_envs": ["choice", [4, 8, 16]],
+    "n_steps": ["choice", [256, 512, 1024, 2048]],
+    "batch_size": ["choice", [256, 512, 1024]],
+    "gamma": ["choice", [0.99, 0.995, 0.999]],
+    "ent_coef": ["loguniform", 1e-4, 5e-2],
+    "learning_rate": ["loguniform", 1e-5, 1e-3],
+    "net_arch": ["choice", [[256, 256], [512, 256], [512, 512, 256]]],
+}
+
+
+def sample_config(space, rng, defaults=None, max_envs=None):
+    """Draws one config from space (a dict as in DEFAULT_SEARCH_SPACE), with at most max_envs envs."""
+    config = dict(defaults or {})
+    for name, spec in space.items():
+        kind = spec[0]
+        if kind == "choice":
+            config[name] = rng.choice(spec[1])
+        elif kind == "uniform":
+            config[name] = rng.uniform(spec[1], spec[2])
+        elif kind == "loguniform":
+            config[name] = math.exp(rng.uniform(math.log(spec[1]), math.log(spec[2])))
+        else:
+            raise ValueError(f"Unknown search space type '{kind}' for {name}")
+
+    if max_envs is not None and "n_envs" in config:
+        config["n_envs"] = min(config["n_envs"], max_envs)
+    # PPO needs at least one full minibatch per rollout
+    if "batch_size" in config and "n_steps" in config and "n_envs" in config:
+        config["batch_size"] = min(config["batch_size"], config["n_steps"] * config["n_envs"])
+    return config
+
+
+def trial_cores(config):
+    """Cores a trial reserves: its env subprocesses plus the learner."""
+    return config["n_envs"] + 1 if config["n_envs"] > 1 else 1
+
+
+def rung_budgets(min_timesteps, eta, rungs):
+    """Cumulative training timesteps per rung: min_timesteps * eta^k."""
+    return [int(min_timesteps * eta ** k) for k in range(rungs)]
+
+
+def reward_slope(curve):
+    """Least-squares slope of a reward curve per rollout (None below 2 points)."""
+    if len(curve) < 2:
+        return None
+    return float(np.polyfit(np.arange(len(curve)), curve, 1)[0])
+
+
+def select_survivors(results, eta, rng=None):
+    """
+    Successive-halving promotion: keeps the top ceil(n / eta) trials by score,
+    breaking ties (e.g. all-zero early win rates) on episode reward, the
+    reward curve (rollout_reward, then reward_slope) and win rate. Trials
+    tied on all of these are ordered by rng (trial id order without one).
+
+    Args:
+        results: dict trial_id -> result dict with a "score" entry.
+        eta: reduction factor.
+        rng: optional random.Random for the final tie-break.
+
+    Returns:
+        List of promoted trial ids, best first.
+    """
+    def key(t):
+        r = results[t]
+        return (
+            r["score"],
+            score_result(r, "mean_reward"),
+            score_result(r, "rollout_reward"),
+            score_result(r, "reward_slope"),
+            score_result(r, "win_rate"),
+        )
+
+    ranked = list(results)
+    if rng is not None:
+        rng.shuffle(ranked)
+    ranked = sorted(ranked, key=key, reverse=True)
+    ranked = [t for t in ranked if np.isfinite(results[t]["score"])]
+    return ranked[:max(1, math.ceil(len(results) / eta))]
+
+
+class ResultsStore:
+    """Append-only JSON-lines log of trial evaluations."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def append(self, record):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def best(self, metric="score"):
+        """Best record of the deepest rung reached (longest-trained trials)."""
+        records = [r for r in self.load() if r.get(metric) is not None]
+        return max(records, key=lambda r: (r.get("rung", 0), r[metric])) if records else None
+
+
+# ----------------------------------------------------------------------
+# Trial worker (runs in a pool process)
+# ----------------------------------------------------------------------
+def evaluate_vs_random(model, n_games=20, max_steps=3000, seed=0, layout_pool=None, env_config=None):
+    """
+    Plays the model as seat 0 against uniformly random legal opponents in
+    CatanEnv. Returns the fraction of games seat 0 wins within max_steps.
+
+    Game g is seeded with seed + g, so trials evaluated with the same seed
+    see identical boards, seating and dice. With a layout_pool (LayoutPool
+    or path), game g is played on pool layout g % len(pool). env_config
+    must match the training envs' observation mode.
+    """
+    from src.env.catan_env import CatanEnv
+
+    env = CatanEnv({**(env_config or {}), "layout_pool": layout_pool})
+    rng = np.random.default_rng(seed)
+    wins = 0
+    for g in range(n_games):
+        options = {"layout": g % len(env.layout_pool)} if env.layout_pool is not None else None
+        obs, _ = env.reset(seed=seed + g, options=options)
+        for _ in range(max_steps):
+            mask = env.get_valid_actions_mask()
+            if env.game.state.current_player_index == 0:
+                action, _ = model.predict(obs, action_masks=mask.astype(bool), deterministic=True)
+            else:
+                action = rng.choice(np.flatnonzero(mask))
+            obs, _, terminated, _, _ = env.step(int(action))
+            if terminated:
+                winner = env.game.winning_color()
+                wins += env.game.state.color_to_index[winner] == 0
+                break
+    return wins / n_games
+
+
+def run_trial(trial_id, config, timesteps, trial_dir, eval_games, seed, eval_seed=0, layout_pool=None):
+    """
+    Trains (or resumes) one trial up to `timesteps` total and evaluates it.
+
+    seed seeds this trial's model; eval_seed (and layout_pool) pick the
+    evaluation games, which should be shared by all trials of a sweep.
+    """
+    from functools import partial
+
+    import torch
+    from stable_baselines3.common.callbacks import BaseCallback
+    from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv
+    from src.agent.train_ppo import build_model, env_config, make_env, model_class
+
+    class RewardCurve(BaseCallback):
+        """Mean per-step reward of every rollout."""
+
+        def __init__(self):
+            super().__init__()
+            self.curve = []
+
+        def _on_step(self):
+            return True
+
+        def _on_rollout_end(self):
+            self.curve.append(float(np.mean(self.model.rollout_buffer.rewards)))
+
+    # Env subprocesses already own this trial's cores
+    torch.set_num_threads(1)
+    start = time.time()
+    os.makedirs(trial_dir, exist_ok=True)
+    model_path = os.path.join(trial_dir, "model.zip")
+
+    n_envs = config["n_envs"]
+    vec_cls = SubprocVecEnv if n_envs > 1 else DummyVecEnv
+    vec_env = vec_cls([partial(make_env, env_config(config)) for _ in range(n_envs)])
+    try:
+        if os.path.exists(model_path):
+            model = model_class(config).load(model_path, env=vec_env, device="cpu")
+        else:
+            model = build_model(vec_env, config, verbose=0, seed=seed, device="cpu")
+        remaining = timesteps - model.num_timesteps
+        curve = RewardCurve()
+        if remaining > 0:
+            model.learn(total_timesteps=remaining, callback=curve, reset_num_timesteps=False)
+        model.save(model_path)
+
+        rewards = [ep["r"] for ep in model.ep_info_buffer]
+        mean_reward = float(np.mean(rewards)) if rewards else None
+        win_rate = evaluate_vs_random(
+            model, n_games=eval_games, seed=eval_seed, layout_pool=layout_pool, env_config=env_config(config)
+        )
+    finally:
+        vec_env.close()
+
+    return {
+        "trial": trial_id,
+        "timesteps": int(model.num_timesteps),
+        "mean_reward": mean_reward,
+        "win_rate": win_rate,
+        # Level of the latest part of the curve; resumed trials only see this rung's rollouts
+        "rollout_reward": float(np.mean(curve.curve[-max(1, len(curve.curve) // 2):])) if curve.curve else None,
+        "reward_slope": reward_slope(curve.curve),
+        "wall_time": time.time() - start,
+    }
+
+
+# ----------------------------------------------------------------------
+# Sweep driver
+# ----------------------------------------------------------------------
+def score_result(result, metric):
+    value = result.get(metric)
+    return float("-inf") if value is None else float(value)
+
+
+def run_rung(trials, budget, args, executor, trial_fn):
+    """
+    Runs every trial in `trials` (trial_id -> config) up to `budget` timesteps,
+    never reserving more than args.cores cores at once (see trial_cores).
+    """
+    pending = list(trials.items())
+    running = {}
+    results = {}
+    free = args.cores
+    while pending or running:
+        # Launch whatever fits in the remaining cores
+        launched = True
+        while pending and launched:
+            launched = False
+            for k, (trial_id, config) in enumerate(pending):
+                need = trial_cores(config)
+                if need <= free or not running:
+                    trial_dir = os.path.join(args.out, f"trial_{trial_id:03d}")
+                    future = executor.submit(
+                        trial_fn, trial_id, config, budget, trial_dir, args.eval_games, args.seed + trial_id,
+                        eval_seed=args.seed, layout_pool=args.layout_pool,
+                    )
+                    running[future] = (trial_id, need)
+                    free -= need
+                    del pending[k]
+                    launched = True
+                    break
+
+        done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            trial_id, need = running.pop(future)
+            free += need
+            try:
+                results[trial_id] = future.result()
+            except Exception as e:
+                print(f"Trial {trial_id} failed: {e!r}")
+                results[trial_id] = {"trial": trial_id, "error": repr(e)}
+            results[trial_id]["score"] = score_result(results[trial_id], args.metric)
+    return results
+
+
+def run_sweep(args, space, executor=None, trial_fn=run_trial):
+    """Runs a full successive-halving sweep. Returns the final rung's results."""
+    from src.agent.train_ppo import DEFAULT_HPARAMS
+
+    rng = random.Random(args.seed)
+    store = ResultsStore(os.path.join(args.out, "trials.jsonl"))
+    # Leave a core for the learner next to the env subprocesses
+    max_envs = max(1, args.cores - 1)
+    configs = {t: sample_config(space, rng, DEFAULT_HPARAMS, max_envs) for t in range(args.trials)}
+
+    if executor is None:
+        executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=args.cores, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    alive = list(configs)
+    budgets = rung_budgets(args.min_timesteps, args.eta, args.rungs)
+    if args.trials < args.eta ** (args.rungs - 1):
+        print(f"Warning: {args.trials} trials run out before rung {args.rungs - 1} with eta={args.eta}; "
+              f"later rungs only continue the best trial (use at least {args.eta ** (args.rungs - 1)} trials)")
+    results = {}
+    with executor:
+        for rung, budget in enumerate(budgets):
+            print(f"Rung {rung}: {len(alive)} trials x {budget} timesteps")
+            results = run_rung({t: configs[t] for t in alive}, budget, args, executor, trial_fn)
+
+            last = rung == len(budgets) - 1
+            survivors = select_survivors(results, args.eta, rng)
+            for trial_id, result in results.items():
+                if "error" in result:
+                    status = "failed"
+                elif not last and trial_id not in survivors:
+                    status = "pruned"
+                else:
+                    status = "completed" if last else "promoted"
+                store.append({
+                    **result,
+                    "score": None if not np.isfinite(result["score"]) else result["score"],
+                    "rung": rung,
+                    "budget": budget,
+                    "status": status,
+                    "config": configs[trial_id],
+                })
+            alive = survivors
+            if not alive:
+                print("Every trial failed; stopping.")
+                break
+
+    best = store.best()
+    if best is not None:
+        print(f"Best trial {best['trial']} (rung {best['rung']}, {args.metric}={best['score']:.3f}): {best['config']}")
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--space", help="JSON search space file (defaults to DEFAULT_SEARCH_SPACE)")
+    parser.add_argument("--trials", type=int, default=27)
+    parser.add_argument("--min-timesteps", type=int, default=50_000, help="Budget of the first rung")
+    parser.add_argument("--eta", type=int, default=3, help="Keep 1/eta trials per rung, budget grows by eta")
+    parser.add_argument("--rungs", type=int, default=3)
+    parser.add_argument("--metric", choices=["win_rate", "mean_reward", "rollout_reward"], default="win_rate")
+    parser.add_argument("--eval-games", type=int, default=20)
+    parser.add_argument("--layout-pool", help="LayoutPool .npz whose boards every trial is evaluated on")
+    parser.add_argument("--cores", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=os.path.join("sweeps", time.strftime("%Y%m%d_%H%M%S")))
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    space = DEFAULT_SEARCH_SPACE
+    if args.space:
+        with open(args.space) as f:
+            space = json.load(f)
+    run_sweep(args, space)
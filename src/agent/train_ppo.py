@@ -4,11 +4,13 @@ import numpy as np
 import torch
 import os
 import sys
+from functools import partial
 
 # Ensure src is in path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from src.env.catan_env import CatanEnv
+from src.agent.all_seat_ppo import AllSeatMaskablePPO
 from sb3_contrib.common.maskable.policies import MaskableMultiInputActorCriticPolicy
 from sb3_contrib.common.wrappers import ActionMasker
 from sb3_contrib.ppo_mask import MaskablePPO
@@ -19,40 +21,61 @@ from stable_baselines3.common.callbacks import CheckpointCallback
 def mask_fn(env: gym.Env) -> np.ndarray:
     return env.get_valid_actions_mask()
 
-def make_env():
-    env = CatanEnv()
+def make_env(config=None):
+    env = CatanEnv(config)
     env = ActionMasker(env, mask_fn)
     env = Monitor(env)
     return env
 
+# Default hyperparameters (overridden per trial by src/agent/sweep.py)
+DEFAULT_HPARAMS = dict(
+    n_envs=16,
+    n_steps=2048,
+    batch_size=1024,
+    gamma=0.995,
+    ent_coef=0.01,
+    learning_rate=3e-4,
+    net_arch=[512, 256],  # Shared sizes for pi and vf
+    all_seats=False,  # Learn from all 4 seats' decisions
+)
+
+def env_config(hparams):
+    # All-seat training needs observations / rewards from the acting seat's view
+    return {"multi_agent": True} if hparams.get("all_seats") else None
+
+def model_class(hparams):
+    return AllSeatMaskablePPO if hparams.get("all_seats") else MaskablePPO
+
+def build_model(vec_env, hparams, **kwargs):
+    # Custom Policy Network (pi and vf both use hparams["net_arch"])
+    policy_kwargs = dict(
+        net_arch=dict(pi=list(hparams["net_arch"]), vf=list(hparams["net_arch"]))
+    )
+    return model_class(hparams)(
+        MaskableMultiInputActorCriticPolicy,
+        vec_env,
+        n_steps=hparams["n_steps"],
+        batch_size=hparams["batch_size"],
+        gamma=hparams["gamma"],
+        ent_coef=hparams["ent_coef"],
+        learning_rate=hparams["learning_rate"],
+        policy_kwargs=policy_kwargs,
+        **kwargs
+    )
+
 if __name__ == "__main__":
     # Hyperparameters
-    n_envs = 16
-    n_steps = 2048
-    batch_size = 1024
-    gamma = 0.995
-    ent_coef = 0.01
-    learning_rate = 3e-4
+    hparams = dict(DEFAULT_HPARAMS)
+    n_envs = hparams["n_envs"]
     total_timesteps = 1_000_000 # Initial run
     
     # Create Vector Env
-    vec_env = SubprocVecEnv([make_env for _ in range(n_envs)])
-    
-    # Custom Policy Network (Shared [512, 256])
-    policy_kwargs = dict(
-        net_arch=dict(pi=[512, 256], vf=[512, 256]) 
-    )
+    vec_env = SubprocVecEnv([partial(make_env, env_config(hparams)) for _ in range(n_envs)])
 
     # Initialize PPO
-    model = MaskablePPO(
-        MaskableMultiInputActorCriticPolicy,
+    model = build_model(
         vec_env,
-        n_steps=n_steps,
-        batch_size=batch_size,
-        gamma=gamma,
-        ent_coef=ent_coef,
-        learning_rate=learning_rate,
-        policy_kwargs=policy_kwargs,
+        hparams,
         verbose=1,
         tensorboard_log="./tensorboard_logs/",
         device="cuda" if torch.cuda.is_available() else "cpu"
@@ -0,0 +1,904 @@
+"""
+Array-backed Catan rules engine that advances B games at once.
+
+All game state lives in NumPy arrays with a leading batch dimension, laid
+over the static board topology in topology.py. Legal-action masks,
+action application and observations are computed for the whole batch with
+vectorized ops; the only per-game Python loops are the longest-road
+searches, run only for games where a road was just built or cut.
+
+Rules mirror catanatron's (the version CatanEnv wraps), including its
+seating-order setup, discard and robber handling, longest road / largest
+army bookkeeping and dev cards being playable on the turn they are bought.
+Seat i is treated as color i (RED, BLUE, WHITE, ORANGE in CatanEnv's
+channel order).
+
+Action indices are CatanEnv's. Actions CatanEnv cannot execute are never
+legal here: maritime / domestic trades (155-200), and Year of Plenty /
+Monopoly (132, 134), which CatanEnv maps without the resource argument
+catanatron requires.
+"""
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.vec_env import VecEnv
+
+from . import layout_pool
+from . import topology as topo
+
+N_PLAYERS = 4
+N_ACTIONS = 202
+
+# --- Action layout (shared with CatanEnv) ---
+ROAD_OFFSET = 54
+BUY_DEV_CARD = 126
+ROLL = 127
+PLAY_KNIGHT = 131
+PLAY_YEAR_OF_PLENTY = 132
+PLAY_ROAD_BUILDING = 133
+PLAY_MONOPOLY = 134
+ROBBER_OFFSET = 136
+END_TURN = 201  # END_TURN or DISCARD (multiplexed, as in CatanEnv)
+
+# --- Prompts (mirror catanatron's ActionPrompt) ---
+BUILD_INITIAL_SETTLEMENT = 0
+BUILD_INITIAL_ROAD = 1
+PLAY_TURN = 2
+DISCARD = 3
+MOVE_ROBBER = 4
+
+# --- Development cards (catanatron's DEVELOPMENT_CARDS order) ---
+KNIGHT, YEAR_OF_PLENTY, MONOPOLY, ROAD_BUILDING, VICTORY_POINT = range(5)
+DEV_CARD_COUNTS = np.array([14, 2, 2, 2, 5], dtype=np.int16)
+
+# --- Costs (WOOD, BRICK, SHEEP, WHEAT, ORE) ---
+ROAD_COST = np.array([1, 1, 0, 0, 0], dtype=np.int16)
+SETTLEMENT_COST = np.array([1, 1, 1, 1, 0], dtype=np.int16)
+CITY_COST = np.array([0, 0, 0, 2, 3], dtype=np.int16)
+DEV_CARD_COST = np.array([0, 0, 1, 1, 1], dtype=np.int16)
+
+BANK_START = 19
+
+
+def longest_road_length(own_edges, blocked_nodes, starts):
+    """
+    Length of the longest trail over own_edges starting from any node in
+    starts, never stepping onto a blocked (enemy) node or reusing an edge.
+    A start may itself be blocked. Same semantics as catanatron's
+    longest_acyclic_path.
+    """
+    best = 0
+    links = topo.NODE_LINKS
+    for start in starts:
+        agenda = [(start, 0, 0)]
+        while agenda:
+            node, used, length = agenda.pop()
+            if length > best:
+                best = length
+            for neighbor, e in links[node]:
+                if own_edges[e] and not blocked_nodes[neighbor] and not (used >> e) & 1:
+                    agenda.append((neighbor, used | (1 << e), length + 1))
+    return best
+
+
+class BatchedCatanEngine:
+    def __init__(self, n_games, vps_to_win=10, discard_limit=7, seed=None):
+        self.n_games = n_games
+        self.vps_to_win = vps_to_win
+        self.discard_limit = discard_limit
+        self.rng = np.random.default_rng(seed)
+
+        B, P = n_games, N_PLAYERS
+        self._rows = np.arange(B)
+
+        # --- Static layout (per game) ---
+        self.hex_resource = np.zeros((B, topo.N_HEXES), dtype=np.int8)
+        self.hex_number = np.zeros((B, topo.N_HEXES), dtype=np.int8)
+        self.port_resource = np.zeros((B, topo.N_PORTS), dtype=np.int8)
+        self._static_board = np.zeros((B, topo.N_HEXES, 17), dtype=np.float32)
+        self._vertex_ports = np.zeros((B, topo.N_NODES, 6), dtype=np.float32)
+
+        # --- Board ---
+        self.node_owner = np.full((B, topo.N_NODES), -1, dtype=np.int8)
+        self.node_level = np.zeros((B, topo.N_NODES), dtype=np.int8)  # 1 settlement, 2 city
+        self.edge_owner = np.full((B, topo.N_EDGES), -1, dtype=np.int8)
+        # Nodes reachable by each player's road network (union of its components)
+        self.network = np.zeros((B, P, topo.N_NODES), dtype=bool)
+        # catanatron's connected_components: per game and seat, a list of node
+        # sets. Sets keep nodes that became enemy-owned (and after a cut the
+        # enemy nodes the split walks reach), and longest road may start there.
+        self.components = [[[] for _ in range(P)] for _ in range(B)]
+        self.robber = np.zeros(B, dtype=np.int64)
+
+        # --- Players ---
+        self.hands = np.zeros((B, P, 5), dtype=np.int16)
+        self.dev_hand = np.zeros((B, P, 5), dtype=np.int16)
+        self.dev_played = np.zeros((B, P, 5), dtype=np.int16)
+        self.victory_points = np.zeros((B, P), dtype=np.int16)  # visible
+        self.actual_victory_points = np.zeros((B, P), dtype=np.int16)
+        self.settlements_available = np.zeros((B, P), dtype=np.int16)
+        self.cities_available = np.zeros((B, P), dtype=np.int16)
+        self.roads_available = np.zeros((B, P), dtype=np.int16)
+        self.has_rolled = np.zeros((B, P), dtype=bool)
+        self.has_played_dev = np.zeros((B, P), dtype=bool)
+        self.road_lengths = np.zeros((B, P), dtype=np.int16)
+
+        # --- Bank ---
+        self.bank = np.zeros((B, 5), dtype=np.int16)
+        self.dev_deck = np.zeros((B, 5), dtype=np.int16)
+
+        # --- Turn / phase ---
+        self.prompt = np.zeros(B, dtype=np.int8)
+        self.current_player = np.zeros(B, dtype=np.int64)
+        self.current_turn = np.zeros(B, dtype=np.int64)
+        self.num_turns = np.zeros(B, dtype=np.int64)
+        self.is_road_building = np.zeros(B, dtype=bool)
+        self.free_roads = np.zeros(B, dtype=np.int16)
+        self.last_settlement = np.zeros(B, dtype=np.int64)
+        self.last_roll = np.zeros(B, dtype=np.int64)
+
+        # --- Awards ---
+        self.road_owner = np.full(B, -1, dtype=np.int64)
+        self.road_length = np.zeros(B, dtype=np.int16)
+        self.army_owner = np.full(B, -1, dtype=np.int64)
+
+        self._mask = None
+
+    # ------------------------------------------------------------------
+    # Reset / layout
+    # ------------------------------------------------------------------
+    def reset(self, idx=None, layouts=None, features=None):
+        """
+        Starts new games in rows idx (all rows by default).
+
+        Args:
+            idx: row indices to reset.
+            layouts: optional (hex_resource, hex_number, port_resource) arrays
+                with a leading len(idx) dimension (see layout_pool.layout_from_catan_map).
+                Random layouts are dealt when omitted.
+            features: optional cached layout_pool.layout_features of layouts.
+        """
+        idx = self._rows if idx is None else np.asarray(idx, dtype=np.int64)
+        if layouts is None:
+            layouts = self.random_layouts(len(idx))
+        self.set_layouts(idx, *layouts, features=features)
+
+        self.node_owner[idx] = -1
+        self.node_level[idx] = 0
+        self.edge_owner[idx] = -1
+        self.network[idx] = False
+        for i in idx:
+            self.components[i] = [[] for _ in range(N_PLAYERS)]
+
+        self.hands[idx] = 0
+        self.dev_hand[idx] = 0
+        self.dev_played[idx] = 0
+        self.victory_points[idx] = 0
+        self.actual_victory_points[idx] = 0
+        self.settlements_available[idx] = 5
+        self.cities_available[idx] = 4
+        self.roads_available[idx] = 15
+        self.has_rolled[idx] = False
+        self.has_played_dev[idx] = False
+        self.road_lengths[idx] = 0
+
+        self.bank[idx] = BANK_START
+        self.dev_deck[idx] = DEV_CARD_COUNTS
+
+        self.prompt[idx] = BUILD_INITIAL_SETTLEMENT
+        self.current_player[idx] = 0
+        self.current_turn[idx] = 0
+        self.num_turns[idx] = 0
+        self.is_road_building[idx] = False
+        self.free_roads[idx] = 0
+        self.last_settlement[idx] = 0
+        self.last_roll[idx] = 0
+
+        self.road_owner[idx] = -1
+        self.road_length[idx] = 0
+        self.army_owner[idx] = -1
+
+        self._mask = None
+
+    def random_layouts(self, n):
+        """Deals n random boards from the base map template."""
+        return layout_pool.random_layouts(self.rng, n)
+
+    def set_layouts(self, idx, hex_resource, hex_number, port_resource, features=None):
+        """
+        Installs layouts in rows idx. features may pass precomputed
+        layout_pool.layout_features for them (e.g. from a LayoutPool).
+        """
+        self.hex_resource[idx] = hex_resource
+        self.hex_number[idx] = hex_number
+        self.port_resource[idx] = port_resource
+        # Robber starts on the desert
+        self.robber[idx] = np.argmax(self.hex_resource[idx] == 0, axis=1)
+
+        if features is None:
+            features = layout_pool.layout_features(hex_resource, hex_number, port_resource)
+        self._static_board[idx] = features["board"]
+        self._vertex_ports[idx] = features["vertex_ports"]
+
+    # ------------------------------------------------------------------
+    # Legal actions
+    # ------------------------------------------------------------------
+    def action_masks(self):
+        """(B, 202) int8 mask of legal actions for the seat currently deciding."""
+        if self._mask is not None:
+            return self._mask
+
+        mask = np.zeros((self.n_games, N_ACTIONS), dtype=np.int8)
+        prompt = self.prompt
+
+        idx = np.flatnonzero(prompt == BUILD_INITIAL_SETTLEMENT)
+        if len(idx):
+            mask[idx, :ROAD_OFFSET] = self._board_buildable(idx)
+
+        idx = np.flatnonzero(prompt == BUILD_INITIAL_ROAD)
+        if len(idx):
+            last = self.last_settlement[idx][:, None]
+            touches = (topo.EDGE_NODES[None, :, 0] == last) | (topo.EDGE_NODES[None, :, 1] == last)
+            mask[idx, ROAD_OFFSET:ROAD_OFFSET + topo.N_EDGES] = touches & (self.edge_owner[idx] < 0)
+
+        idx = np.flatnonzero(prompt == PLAY_TURN)
+        if len(idx):
+            seats = self.current_player[idx]
+            roads = self._road_options(idx, seats)
+            can_knight = self._can_play_dev(idx, seats, KNIGHT)
+
+            building = self.is_road_building[idx]
+            rolled = self.has_rolled[idx, seats] & ~building
+            before_roll = ~self.has_rolled[idx, seats] & ~building
+
+            r = idx[building]
+            mask[r, ROAD_OFFSET:ROAD_OFFSET + topo.N_EDGES] = roads[building]
+
+            r = idx[before_roll]
+            mask[r, ROLL] = 1
+            mask[r, PLAY_KNIGHT] = can_knight[before_roll]
+
+            if rolled.any():
+                r, s = idx[rolled], seats[rolled]
+                roads = roads[rolled]
+                mask[r, END_TURN] = 1
+                mask[r, ROAD_OFFSET:ROAD_OFFSET + topo.N_EDGES] = roads
+                mask[r, :ROAD_OFFSET] = self._settlement_options(r, s) | self._city_options(r, s)
+                mask[r, BUY_DEV_CARD] = self._can_afford(r, s, DEV_CARD_COST) & (self.dev_deck[r].sum(axis=1) > 0)
+                mask[r, PLAY_KNIGHT] = can_knight[rolled]
+                mask[r, PLAY_ROAD_BUILDING] = self._can_play_dev(r, s, ROAD_BUILDING) & roads.any(axis=1)
+
+        idx = np.flatnonzero(prompt == DISCARD)
+        mask[idx, END_TURN] = 1
+
+        idx = np.flatnonzero(prompt == MOVE_ROBBER)
+        if len(idx):
+            mask[idx, ROBBER_OFFSET:ROBBER_OFFSET + topo.N_HEXES] = 1
+            mask[idx, ROBBER_OFFSET + self.robber[idx]] = 0
+
+        self._mask = mask
+        return mask
+
+    def _can_afford(self, idx, seats, cost):
+        return (self.hands[idx, seats] >= cost).all(axis=1)
+
+    def _can_play_dev(self, idx, seats, card):
+        return ~self.has_played_dev[idx, seats] & (self.dev_hand[idx, seats, card] >= 1)
+
+    def _enemy_nodes(self, idx, seats):
+        owner = self.node_owner[idx]
+        return (owner >= 0) & (owner != seats[:, None])
+
+    def _board_buildable(self, idx):
+        """Distance rule: empty land nodes with no adjacent building."""
+        occupied = np.zeros((len(idx), topo.N_NODES + 1), dtype=bool)
+        occupied[:, :-1] = self.node_owner[idx] >= 0
+        blocked = occupied[:, :-1] | occupied[:, topo.NODE_NEIGHBORS].any(axis=2)
+        return ~blocked
+
+    def _road_options(self, idx, seats):
+        expandable = self.network[idx, seats] & ~self._enemy_nodes(idx, seats)
+        options = expandable[:, topo.EDGE_NODES].any(axis=2) & (self.edge_owner[idx] < 0)
+        allowed = self._can_afford(idx, seats, ROAD_COST) & (self.roads_available[idx, seats] > 0)
+        return options & allowed[:, None]
+
+    def _settlement_options(self, idx, seats):
+        options = self.network[idx, seats] & self._board_buildable(idx)
+        allowed = self._can_afford(idx, seats, SETTLEMENT_COST) & (self.settlements_available[idx, seats] > 0)
+        return options & allowed[:, None]
+
+    def _city_options(self, idx, seats):
+        options = (self.node_owner[idx] == seats[:, None]) & (self.node_level[idx] == 1)
+        allowed = self._can_afford(idx, seats, CITY_COST) & (self.cities_available[idx, seats] > 0)
+        return options & allowed[:, None]
+
+    # ------------------------------------------------------------------
+    # Step
+    # ------------------------------------------------------------------
+    def step(self, actions):
+        """
+        Applies one action per game for the seat currently deciding.
+
+        Args:
+            actions: (B,) action indices. Negative entries leave that game untouched.
+
+        Returns:
+            (B,) bool array, True where the action was legal and applied.
+            Illegal actions leave the game unchanged (as a failed
+            catanatron execute does in CatanEnv).
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        rows = self._rows
+        active = actions >= 0
+        legal = np.zeros(self.n_games, dtype=bool)
+        legal[active] = self.action_masks()[rows[active], actions[active]] == 1
+
+        a = actions
+        prompt = self.prompt
+        in_turn = prompt == PLAY_TURN
+        node = np.clip(a, 0, topo.N_NODES - 1)
+
+        is_node = legal & (a < ROAD_OFFSET)
+        is_city = is_node & in_turn & (self.node_owner[rows, node] == self.current_player)
+        is_road = legal & (a >= ROAD_OFFSET) & (a < ROAD_OFFSET + topo.N_EDGES)
+        is_robber = legal & (a >= ROBBER_OFFSET) & (a < ROBBER_OFFSET + topo.N_HEXES)
+
+        groups = [
+            (is_node & (prompt == BUILD_INITIAL_SETTLEMENT), self._apply_initial_settlement),
+            (is_node & in_turn & ~is_city, self._apply_settlement),
+            (is_city, self._apply_city),
+            (is_road & (prompt == BUILD_INITIAL_ROAD), self._apply_initial_road),
+            (is_road & in_turn & self.is_road_building, self._apply_free_road),
+            (is_road & in_turn & ~self.is_road_building, self._apply_road),
+            (legal & (a == BUY_DEV_CARD), self._apply_buy_dev_card),
+            (legal & (a == ROLL), self._apply_roll),
+            (legal & (a == PLAY_KNIGHT), self._apply_knight),
+            (legal & (a == PLAY_ROAD_BUILDING), self._apply_road_building),
+            (is_robber, self._apply_move_robber),
+            (legal & (a == END_TURN) & (prompt == DISCARD), self._apply_discard),
+            (legal & (a == END_TURN) & in_turn, self._apply_end_turn),
+        ]
+        # Groups are disjoint, so select them all before mutating anything
+        selected = [(np.flatnonzero(sel), fn) for sel, fn in groups]
+        for idx, fn in selected:
+            if len(idx):
+                fn(idx, actions[idx])
+
+        self._mask = None
+        return legal
+
+    def winners(self):
+        """(B,) seat that reached vps_to_win (last such seat, as catanatron), -1 if none."""
+        reached = self.actual_victory_points >= self.vps_to_win
+        last = N_PLAYERS - 1 - np.argmax(reached[:, ::-1], axis=1)
+        return np.where(reached.any(axis=1), last, -1)
+
+    # ------------------------------------------------------------------
+    # Action handlers (idx: rows, a: their action indices)
+    # ------------------------------------------------------------------
+    def _apply_initial_settlement(self, idx, a):
+        seats = self.current_player[idx]
+        self._place_settlement(idx, seats, a)
+        self.network[idx, seats, a] = True
+        for i, seat, node in zip(idx, seats, a):
+            self.components[i][seat].append({int(node)})
+        self.last_settlement[idx] = a
+
+        # Second settlement yields one card per adjacent resource tile
+        second = self.settlements_available[idx, seats] == 3
+        r, s, n = idx[second], seats[second], a[second]
+        padded = np.zeros((len(r), topo.N_HEXES + 1), dtype=np.int64)
+        padded[:, :-1] = self.hex_resource[r]
+        for res in padded[np.arange(len(r))[:, None], topo.NODE_HEXES[n]].T:
+            got = res > 0
+            rr, ss, kk = r[got], s[got], res[got] - 1
+            self.hands[rr, ss, kk] += 1
+            self.bank[rr, kk] -= 1
+
+        self.prompt[idx] = BUILD_INITIAL_ROAD
+
+    def _apply_settlement(self, idx, a):
+        seats = self.current_player[idx]
+        self._place_settlement(idx, seats, a)
+        self._pay(idx, seats, SETTLEMENT_COST)
+
+        # A settlement on a node where an opponent has two roads cuts that road
+        padded = np.full((len(idx), topo.N_EDGES + 1), -1, dtype=np.int64)
+        padded[:, :-1] = self.edge_owner[idx]
+        around = padded[np.arange(len(idx))[:, None], topo.NODE_EDGES[a]]
+        counts = (around[:, :, None] == np.arange(N_PLAYERS)[None, None, :]).sum(axis=1)
+        counts[np.arange(len(idx)), seats] = 0
+        for i, owner in zip(*np.nonzero(counts == 2)):
+            self._cut_road(idx[i], owner, a[i])
+
+    def _apply_city(self, idx, a):
+        seats = self.current_player[idx]
+        self.node_level[idx, a] = 2
+        self.settlements_available[idx, seats] += 1
+        self.cities_available[idx, seats] -= 1
+        self.victory_points[idx, seats] += 1
+        self.actual_victory_points[idx, seats] += 1
+        self._pay(idx, seats, CITY_COST)
+
+    def _apply_initial_road(self, idx, a):
+        seats = self.current_player[idx]
+        self._place_road(idx, seats, a - ROAD_OFFSET)
+
+        # Snake order: 0, 1, 2, 3, 3, 2, 1, 0
+        placed = (self.node_level[idx] > 0).sum(axis=1)
+        forward = placed < N_PLAYERS
+        backward = (placed > N_PLAYERS) & (placed < 2 * N_PLAYERS)
+        self._advance_turn(idx[forward], 1)
+        self._advance_turn(idx[backward], -1)
+        self.prompt[idx] = np.where(placed == 2 * N_PLAYERS, PLAY_TURN, BUILD_INITIAL_SETTLEMENT)
+
+    def _apply_road(self, idx, a):
+        seats = self.current_player[idx]
+        previous = self.road_owner[idx].copy()
+        self._place_road(idx, seats, a - ROAD_OFFSET)
+        self._pay(idx, seats, ROAD_COST)
+        self._award_longest_road(idx, previous)
+
+    def _apply_free_road(self, idx, a):
+        seats = self.current_player[idx]
+        previous = self.road_owner[idx].copy()
+        self._place_road(idx, seats, a - ROAD_OFFSET)
+        self._award_longest_road(idx, previous)
+
+        self.free_roads[idx] -= 1
+        done = (self.free_roads[idx] == 0) | ~self._road_options(idx, seats).any(axis=1)
+        self.is_road_building[idx[done]] = False
+
+    def _apply_buy_dev_card(self, idx, a):
+        seats = self.current_player[idx]
+        self._pay(idx, seats, DEV_CARD_COST)
+        cards = self._draw_dev_cards(idx)
+        self.dev_deck[idx, cards] -= 1
+        self.dev_hand[idx, seats, cards] += 1
+        self.actual_victory_points[idx, seats] += cards == VICTORY_POINT
+
+    def _apply_roll(self, idx, a):
+        seats = self.current_player[idx]
+        self.has_rolled[idx, seats] = True
+        number = self._roll_dice(idx)
+        self.last_roll[idx] = number
+        self.prompt[idx] = PLAY_TURN
+
+        seven = number == 7
+        r = idx[seven]
+        discarders = self.hands[r].sum(axis=2) > self.discard_limit
+        discarding = discarders.any(axis=1)
+        self.current_player[r[discarding]] = np.argmax(discarders[discarding], axis=1)
+        self.prompt[r] = np.where(discarding, DISCARD, MOVE_ROBBER)
+
+        r, number = idx[~seven], number[~seven]
+        if len(r):
+            self._yield_resources(r, number)
+
+    def _apply_discard(self, idx, a):
+        seats = self.current_player[idx]
+        discarded = self._discard_cards(idx, seats)
+        self.hands[idx, seats] -= discarded
+        self.bank[idx] += discarded
+
+        # Next seat after this one still over the limit (catanatron hard-codes 7 here)
+        pending = (self.hands[idx].sum(axis=2) > 7) & (np.arange(N_PLAYERS)[None, :] > seats[:, None])
+        more = pending.any(axis=1)
+        self.current_player[idx[more]] = np.argmax(pending[more], axis=1)
+        done = idx[~more]
+        self.current_player[done] = self.current_turn[done]
+        self.prompt[done] = MOVE_ROBBER
+
+    def _apply_move_robber(self, idx, a):
+        seats = self.current_player[idx]
+        hexes = a - ROBBER_OFFSET
+        self.robber[idx] = hexes
+        self.prompt[idx] = PLAY_TURN
+
+        owners = self.node_owner[idx[:, None], topo.HEX_NODES[hexes]]
+        players = np.arange(N_PLAYERS)
+        candidates = (
+            (owners[:, :, None] == players[None, None, :]).any(axis=1)
+            & (players[None, :] != seats[:, None])
+            & (self.hands[idx].sum(axis=2) >= 1)
+        )
+        victims = self._choose_victims(idx, candidates)
+        robbed = victims >= 0
+        r, s, v = idx[robbed], seats[robbed], victims[robbed]
+        if len(r):
+            cards = self._steal_cards(r, v)
+            self.hands[r, v, cards] -= 1
+            self.hands[r, s, cards] += 1
+
+    def _apply_knight(self, idx, a):
+        seats = self.current_player[idx]
+        previous = self.army_owner[idx]
+        previous_size = np.where(
+            previous >= 0, self.dev_played[idx, np.maximum(previous, 0), KNIGHT], 0
+        )
+        self._play_dev(idx, seats, KNIGHT)
+        self.prompt[idx] = MOVE_ROBBER
+
+        size = self.dev_played[idx, seats, KNIGHT]
+        award = (size >= 3) & ((previous < 0) | ((previous_size < size) & (previous != seats)))
+        self._transfer_award(idx[award], previous[award], seats[award], self.army_owner)
+
+    def _apply_road_building(self, idx, a):
+        seats = self.current_player[idx]
+        self._play_dev(idx, seats, ROAD_BUILDING)
+        self.is_road_building[idx] = True
+        self.free_roads[idx] = 2
+
+    def _apply_end_turn(self, idx, a):
+        seats = self.current_player[idx]
+        self.has_rolled[idx, seats] = False
+        self.has_played_dev[idx, seats] = False
+        self._advance_turn(idx, 1)
+        self.prompt[idx] = PLAY_TURN
+
+    # ------------------------------------------------------------------
+    # State helpers
+    # ------------------------------------------------------------------
+    def _advance_turn(self, idx, direction):
+        self.current_player[idx] = (self.current_player[idx] + direction) % N_PLAYERS
+        self.current_turn[idx] = self.current_player[idx]
+        self.num_turns[idx] += 1
+
+    def _pay(self, idx, seats, cost):
+        self.hands[idx, seats] -= cost
+        self.bank[idx] += cost
+
+    def _play_dev(self, idx, seats, card):
+        self.dev_hand[idx, seats, card] -= 1
+        self.dev_played[idx, seats, card] += 1
+        self.has_played_dev[idx, seats] = True
+
+    def _place_settlement(self, idx, seats, nodes):
+        self.node_owner[idx, nodes] = seats
+        self.node_level[idx, nodes] = 1
+        self.settlements_available[idx, seats] -= 1
+        self.victory_points[idx, seats] += 1
+        self.actual_victory_points[idx, seats] += 1
+
+    def _place_road(self, idx, seats, edges):
+        self.edge_owner[idx, edges] = seats
+        self.roads_available[idx, seats] -= 1
+        for end in topo.EDGE_NODES[edges].T:
+            owner = self.node_owner[idx, end]
+            self.network[idx, seats, end] |= (owner < 0) | (owner == seats)
+
+        # Longest road over the component the new road belongs to
+        for i, seat, edge in zip(idx, seats, edges):
+            own_edges = self.edge_owner[i] == seat
+            blocked = (self.node_owner[i] >= 0) & (self.node_owner[i] != seat)
+            component = self._join_component(self.components[i][seat], *topo.EDGE_NODES[edge], blocked)
+            length = longest_road_length(own_edges, blocked, component)
+            self.road_lengths[i, seat] = max(self.road_lengths[i, seat], length)
+            if length >= 5 and length > self.road_length[i]:
+                self.road_owner[i] = seat
+                self.road_length[i] = length
+
+    @staticmethod
+    def _component_index(components, node):
+        for k, component in enumerate(components):
+            if node in component:
+                return k
+        return None
+
+    def _join_component(self, components, a, b, blocked):
+        """Adds road (a, b) to a seat's components as catanatron's build_road does; returns its component."""
+        a, b = int(a), int(b)
+        a_index = self._component_index(components, a)
+        b_index = self._component_index(components, b)
+        if a_index is None and b_index is not None and not blocked[a]:
+            components[b_index].add(a)
+            return components[b_index]
+        if a_index is not None and b_index is None and not blocked[b]:
+            components[a_index].add(b)
+            return components[a_index]
+        if a_index is not None and b_index is not None and a_index != b_index:
+            merged = components[a_index] | components[b_index]
+            for k in sorted((a_index, b_index), reverse=True):
+                del components[k]
+            components.append(merged)
+            return merged
+        return components[a_index if a_index is not None else b_index]
+
+    @staticmethod
+    def _road_walk(start, own_edges, blocked):
+        """Nodes reached from start over own roads, stopping at (but keeping) enemy nodes."""
+        visited = set()
+        agenda = [start]
+        while agenda:
+            node = agenda.pop()
+            visited.add(node)
+            if blocked[node]:
+                continue
+            agenda.extend(n for n, e in topo.NODE_LINKS[node] if own_edges[e] and n not in visited)
+        return visited
+
+    def _cut_road(self, i, seat, node):
+        """Splits seat's network at node, where an opponent just settled between two of its roads."""
+        previous = np.array([self.road_owner[i]])
+        own_edges = self.edge_owner[i] == seat
+        blocked = (self.node_owner[i] >= 0) & (self.node_owner[i] != seat)
+        components = self.components[i][seat]
+        halves = [self._road_walk(n, own_edges, blocked) for n, e in topo.NODE_LINKS[node] if own_edges[e]]
+        del components[self._component_index(components, int(node))]
+        components.extend(halves)
+        for half in halves:
+            self.network[i, seat, list(half)] = True
+
+        self.road_lengths[i, seat] = max(longest_road_length(own_edges, blocked, c) for c in components)
+        # catanatron re-elects the holder as the longest road overall after a cut
+        owner = int(np.argmax(self.road_lengths[i]))
+        self.road_owner[i] = owner
+        self.road_length[i] = self.road_lengths[i, owner]
+        self._award_longest_road(np.array([i]), previous)
+
+    def _award_longest_road(self, idx, previous):
+        current = self.road_owner[idx]
+        changed = (current >= 0) & (current != previous)
+        self._transfer_award(idx[changed], previous[changed], current[changed], None)
+
+    def _transfer_award(self, idx, losers, winners, owner_array):
+        """Moves a 2 VP award to winners, taking it from losers (-1 for nobody)."""
+        if owner_array is not None:
+            owner_array[idx] = winners
+        self.victory_points[idx, winners] += 2
+        self.actual_victory_points[idx, winners] += 2
+        had = losers >= 0
+        self.victory_points[idx[had], losers[had]] -= 2
+        self.actual_victory_points[idx[had], losers[had]] -= 2
+
+    def _yield_resources(self, idx, number):
+        producing = (self.hex_number[idx] == number[:, None])
+        producing[np.arange(len(idx)), self.robber[idx]] = False
+
+        hex_res = self.hex_resource[idx].astype(np.int64)
+        per_hex = np.zeros((len(idx), topo.N_HEXES, 6), dtype=np.float32)
+        per_hex[np.arange(len(idx))[:, None], np.arange(topo.N_HEXES)[None, :], hex_res] = producing
+        per_node = topo.NODE_HEX_MATRIX @ per_hex[:, :, 1:]  # (n, 54, 5)
+
+        owners = self.node_owner[idx]
+        levels = np.where(
+            owners[:, None, :] == np.arange(N_PLAYERS)[None, :, None],
+            self.node_level[idx][:, None, :], 0,
+        ).astype(np.float32)
+        payout = np.rint(levels @ per_node).astype(np.int16)  # (n, 4, 5)
+
+        # A resource the bank can't cover in full is paid to nobody
+        depleted = payout.sum(axis=1) > self.bank[idx]
+        payout[np.broadcast_to(depleted[:, None, :], payout.shape)] = 0
+        self.hands[idx] += payout
+        self.bank[idx] -= payout.sum(axis=1)
+
+    # ------------------------------------------------------------------
+    # Chance events (override to replay recorded outcomes)
+    # ------------------------------------------------------------------
+    def _roll_dice(self, idx):
+        n = len(idx)
+        return self.rng.integers(1, 7, size=n) + self.rng.integers(1, 7, size=n)
+
+    def _draw_dev_cards(self, idx):
+        return self._sample_from_counts(self.dev_deck[idx])
+
+    def _choose_victims(self, idx, candidates):
+        keys = np.where(candidates, self.rng.random(candidates.shape), -1.0)
+        return np.where(candidates.any(axis=1), np.argmax(keys, axis=1), -1)
+
+    def _steal_cards(self, idx, victims):
+        return self._sample_from_counts(self.hands[idx, victims])
+
+    def _discard_cards(self, idx, seats):
+        hand = self.hands[idx, seats].copy()
+        to_discard = hand.sum(axis=1) // 2
+        discarded = np.zeros_like(hand)
+        for k in range(int(to_discard.max(initial=0))):
+            r = np.flatnonzero(to_discard > k)
+            cards = self._sample_from_counts(hand[r])
+            hand[r, cards] -= 1
+            discarded[r, cards] += 1
+        return discarded
+
+    def _sample_from_counts(self, counts):
+        """One index per row, drawn proportionally to the (n, k) counts."""
+        totals = counts.sum(axis=1)
+        picks = self.rng.integers(0, np.maximum(totals, 1))
+        return (picks[:, None] >= np.cumsum(counts, axis=1)).sum(axis=1)
+
+    # ------------------------------------------------------------------
+    # Observations
+    # ------------------------------------------------------------------
+    def observe(self, player_id=0):
+        """Batched observations in CatanEnv's layout, from seat player_id's view."""
+        B = self.n_games
+        rows = self._rows
+
+        # --- 1. Board Grid ---
+        board_obs = self._static_board.copy()
+        robber_slot = topo.HEX_BOARD_SLOT[self.robber]
+        shown = robber_slot >= 0
+        board_obs[rows[shown], robber_slot[shown], 16] = 1.0
+
+        # --- 2. Vertices ---
+        vertex_obs = np.zeros((B, topo.N_NODES, 15), dtype=np.float32)
+        vertex_obs[:, :, 9:15] = self._vertex_ports
+        g, n = np.nonzero(self.node_owner >= 0)
+        channel = np.where(self.node_level[g, n] == 1, 1, 5) + self.node_owner[g, n]
+        vertex_obs[g, n, channel] = 1.0
+
+        # --- 3. Edges ---
+        edge_obs = np.zeros((B, topo.N_EDGES, 5), dtype=np.float32)
+        g, e = np.nonzero(self.edge_owner >= 0)
+        edge_obs[g, e, 1 + self.edge_owner[g, e]] = 1.0
+
+        # --- 4. Globals ---
+        global_obs = np.zeros((B, 59), dtype=np.float32)
+        global_obs[:, 0:4] = self.victory_points
+        global_obs[:, 4:9] = self.hands[:, player_id]
+        opponents = [(player_id + i) % N_PLAYERS for i in range(1, N_PLAYERS)]
+        global_obs[:, 9:24] = self.hands[:, opponents].reshape(B, 15)
+
+        return {
+            "board": board_obs,
+            "vertices": vertex_obs,
+            "edges": edge_obs,
+            "globals": global_obs,
+        }
+
+
+class BatchedCatanEnv:
+    """
+    Vectorized counterpart of CatanEnv backed by BatchedCatanEngine.
+
+    Same observation / action spaces and reward as CatanEnv (per game), with
+    every method taking or returning a leading batch dimension. Finished
+    games are reset automatically; their final observation is returned in
+    infos[i]["terminal_observation"].
+    """
+
+    render_mode = None
+
+    def __init__(self, n_envs, config=None, seed=None):
+        self.config = config or {}
+        self.n_envs = n_envs
+        self.player_id = 0
+        # Optional turn cap (CatanEnv itself never truncates)
+        self.max_turns = self.config.get("max_turns")
+        # Optional layout pool, same config keys as CatanEnv
+        pool = self.config.get("layout_pool")
+        self.layout_pool = layout_pool.LayoutPool.load(pool) if isinstance(pool, str) else pool
+        self.layout_mode = self.config.get("layout_mode", "uniform")
+        self.layout_index = self.config.get("layout_index", 0)
+        self.curriculum_start = self.config.get("curriculum_start", 0.1)
+        self.curriculum_resets = self.config.get("curriculum_resets", 1000)
+        self._n_resets = 0
+        self.layout_ids = np.full(n_envs, -1, dtype=np.int64)
+
+        self.observation_space = spaces.Dict({
+            "board": spaces.Box(low=0, high=1, shape=(topo.N_HEXES, 17), dtype=np.float32),
+            "vertices": spaces.Box(low=0, high=1, shape=(topo.N_NODES, 15), dtype=np.float32),
+            "edges": spaces.Box(low=0, high=1, shape=(topo.N_EDGES, 5), dtype=np.float32),
+            "globals": spaces.Box(low=0, high=float('inf'), shape=(59,), dtype=np.float32),
+        })
+        self.action_space = spaces.Discrete(N_ACTIONS)
+
+        self.engine = BatchedCatanEngine(n_envs, seed=seed)
+        self._last_vp = np.zeros(n_envs, dtype=np.float32)
+
+    def reset(self, seed=None, options=None):
+        if seed is not None:
+            self.engine.rng = np.random.default_rng(seed)
+        self._reset_games(np.arange(self.n_envs))
+        self._last_vp[:] = 0
+        return self.engine.observe(self.player_id), [{} for _ in range(self.n_envs)]
+
+    def step(self, actions):
+        engine = self.engine
+        applied = engine.step(actions)
+
+        curr_vp = engine.victory_points[:, self.player_id].astype(np.float32)
+        rewards = np.where(applied, curr_vp - self._last_vp, -1.0).astype(np.float32)
+        self._last_vp = np.where(applied, curr_vp, self._last_vp)
+
+        winners = engine.winners()
+        terminated = winners >= 0
+        rewards += np.where(applied & (winners == self.player_id), 10.0, 0.0).astype(np.float32)
+        if self.max_turns is not None:
+            truncated = ~terminated & (engine.num_turns >= self.max_turns)
+        else:
+            truncated = np.zeros(self.n_envs, dtype=bool)
+
+        obs = engine.observe(self.player_id)
+        infos = [{} for _ in range(self.n_envs)]
+        done = np.flatnonzero(terminated | truncated)
+        if len(done):
+            for i in done:
+                infos[i]["terminal_observation"] = {k: v[i].copy() for k, v in obs.items()}
+            self._reset_games(done)
+            self._last_vp[done] = 0
+            fresh = engine.observe(self.player_id)
+            for k in obs:
+                obs[k][done] = fresh[k][done]
+
+        return obs, rewards, terminated, truncated, infos
+
+    def _reset_games(self, idx):
+        if self.layout_pool is None:
+            self.engine.reset(idx)
+            return
+        pool = self.layout_pool
+        progress = self._n_resets / max(1, self.curriculum_resets)
+        ids = pool.sample(self.engine.rng, self.layout_mode, size=len(idx), progress=progress,
+                          index=self.layout_index, start_fraction=self.curriculum_start)
+        self._n_resets += len(idx)
+        self.layout_ids[idx] = ids
+        features = {k: v[ids] for k, v in pool.features.items()}
+        self.engine.reset(idx, layouts=pool.layouts(ids), features=features)
+
+    def get_valid_actions_mask(self):
+        return self.engine.action_masks()
+
+    def render(self):
+        pass
+
+
+class BatchedVecEnv(VecEnv):
+    """
+    Stable-Baselines3 VecEnv over one BatchedCatanEnv, so MaskablePPO can
+    train on the batched engine in a single process:
+
+        env = VecMonitor(BatchedVecEnv(64, config))  # VecMonitor for episode stats
+        model = build_model(env, hparams)
+
+    env_method("action_masks") returns each game's legal-action mask, which
+    is how MaskablePPO reads masks from a VecEnv. Other env_method / get_attr
+    calls go to the BatchedCatanEnv, whose methods act on the whole batch.
+    """
+
+    def __init__(self, n_envs, config=None, seed=None):
+        self.env = BatchedCatanEnv(n_envs, config=config, seed=seed)
+        super().__init__(n_envs, self.env.observation_space, self.env.action_space)
+        self._actions = None
+
+    def reset(self):
+        # VecEnv.seed() stores one seed per env; the engine has a single rng
+        obs, self.reset_infos = self.env.reset(seed=self._seeds[0])
+        self._reset_seeds()
+        self._reset_options()
+        return obs
+
+    def step_async(self, actions):
+        self._actions = np.asarray(actions)
+
+    def step_wait(self):
+        obs, rewards, terminated, truncated, infos = self.env.step(self._actions)
+        for i in np.flatnonzero(truncated):
+            infos[i]["TimeLimit.truncated"] = True
+        return obs, rewards, terminated | truncated, infos
+
+    def action_masks(self):
+        return self.env.get_valid_actions_mask().astype(bool)
+
+    def close(self):
+        pass
+
+    def get_attr(self, attr_name, indices=None):
+        value = getattr(self.env, attr_name)
+        return [value for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        setattr(self.env, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        if method_name == "action_masks":
+            masks = self.action_masks()
+            return [masks[i] for i in self._get_indices(indices)]
+        result = getattr(self.env, method_name)(*method_args, **method_kwargs)
+        return [result for _ in self._get_indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
+
+    def has_attr(self, attr_name):
+        return attr_name == "action_masks" or hasattr(self.env, attr_name)
@@ -5,6 +5,10 @@ from catanatron import Game, Color, Action
 from catanatron.models.enums import ActionType
 from catanatron.models.player import Player
 from .wrappers.resource_tracker import ResourceTracker
+from . import topology
+from .layout_pool import SAMPLING_MODES, LayoutPool, layout_features, layout_from_catan_map
+from .streaming import GameStreamEncoder, UDPPublisher
+from .opening_book import OPENING_MODES, OpeningBook, combined_scores, play_setup
 
 class CatanEnv(gym.Env):
     metadata = {"render_modes": ["human", "rgb_array"], "render_fps": 4}
@@ -12,6 +16,23 @@ class CatanEnv(gym.Env):
     def __init__(self, config=None):
         super().__init__()
         self.config = config or {}
+
+        # --- Opening book (see opening_book.py) ---
+        # config["opening_book"]: book directory, OpeningBook, or True for an
+        # in-memory book. opening_mode "auto" plays every seat's setup phase
+        # from the book in reset(); "features" instead adds the book's score
+        # (normalized per board) as an extra vertex channel. Only layouts from
+        # config["layout_pool"] are saved to a book directory.
+        book = self.config.get("opening_book")
+        if book is True:
+            book = OpeningBook()
+        self.opening_book = OpeningBook(book) if isinstance(book, str) else book
+        self.opening_mode = self.config.get("opening_mode", "auto")
+        if self.opening_mode not in OPENING_MODES:
+            raise ValueError(f"Unknown opening_mode '{self.opening_mode}', expected one of {OPENING_MODES}")
+        self.opening_features = self.opening_book is not None and self.opening_mode == "features"
+        self._book_map = None
+        self._book_scores = None
         
         # --- Observation Space ---
         # 1. Board Grid (19 Hexes)
@@ -21,8 +42,9 @@ class CatanEnv(gym.Env):
         
         # 2. Vertices (54 Nodes)
         # Features: 1 Empty + 4 Settlements + 4 Cities + 6 Port Types = 15
+        # (+ 1 Opening Book Score with opening_mode "features")
         self.n_vertices = 54
-        self.n_vertex_features = 1 + 4 + 4 + 6
+        self.n_vertex_features = 1 + 4 + 4 + 6 + int(self.opening_features)
         
         # 3. Edges (72 Links)
         # Features: 1 Empty + 4 Roads = 5
@@ -59,6 +81,12 @@ class CatanEnv(gym.Env):
         
         self.game = None
         self.player_id = 0 # Agent controls player 0
+        # Multi-agent mode: observations are from whichever seat is acting,
+        # with owner channels and VPs rotated so channel 0 is that seat.
+        # info["seat"] is the seat the observation belongs to and
+        # info["seat_rewards"] the per-seat rewards of the last step. The
+        # returned reward stays player_id's, so Monitor reports its return.
+        self.multi_agent = self.config.get("multi_agent", False)
         self.resource_tracker = ResourceTracker()
         
         # Build static mappings for consistent indexing
@@ -74,6 +102,41 @@ class CatanEnv(gym.Env):
 
         self._last_vp = 0
 
+        # --- Board layouts ---
+        # config["layout_pool"] (a LayoutPool or a path to a saved one) makes
+        # resets draw from a fixed set of boards with cached static features:
+        #   layout_mode "uniform" | "curriculum" | "fixed" (config["layout_index"])
+        #   curriculum: the first curriculum_start fraction of the pool, growing
+        #   to the whole pool over curriculum_resets resets.
+        # Without a pool every reset deals a fresh random board.
+        pool = self.config.get("layout_pool")
+        self.layout_pool = LayoutPool.load(pool) if isinstance(pool, str) else pool
+        self.layout_mode = self.config.get("layout_mode", "uniform")
+        if self.layout_mode not in SAMPLING_MODES:
+            raise ValueError(f"Unknown layout_mode '{self.layout_mode}', expected one of {SAMPLING_MODES}")
+        self.layout_index = self.config.get("layout_index", 0)
+        self.curriculum_start = self.config.get("curriculum_start", 0.1)
+        self.curriculum_resets = self.config.get("curriculum_resets", 1000)
+        self._n_resets = 0
+
+        self.layout_id = None  # pool index of the current board
+        self.layout_features = None  # layout_pool.layout_features of the current board
+        self._features_map = None  # CatanMap layout_features was computed for
+
+        # --- Live streaming (see streaming.py) ---
+        # config["stream"]: "host:port" of a streaming hub, or any object with
+        # publish(frame). Every reset / step then publishes a frame.
+        # config["stream_every_n_games"]: stream only every nth game, so that
+        # long training runs pay the encoding cost on a fraction of steps.
+        stream = self.config.get("stream")
+        self.stream = UDPPublisher(stream) if isinstance(stream, (str, tuple)) else stream
+        self.stream_every_n_games = self.config.get("stream_every_n_games", 1)
+        self._stream_encoder = None
+        self._streaming = False  # whether the current game is streamed
+        self._n_games = 0
+        if self.stream is not None:
+            self._stream_encoder = GameStreamEncoder(self.config.get("stream_keyframe_interval", 100))
+
     def _build_edge_list(self):
         # Brute-force discovery of all edges by placing settlements everywhere
         edges = set()
@@ -103,22 +166,72 @@ class CatanEnv(gym.Env):
         return edge_list
 
     def reset(self, seed=None, options=None):
+        """
+        Starts a new game. reset(seed=s) reproduces the same board, seating
+        and dice given the same actions; options={"layout": i} forces pool
+        layout i.
+        """
         super().reset(seed=seed)
+        options = options or {}
         players = [
             Player(Color.RED),
             Player(Color.BLUE),
             Player(Color.WHITE),
             Player(Color.ORANGE),
         ]
-        self.game = Game(players)
+
+        catan_map = None
+        self.layout_id = None
+        if self.layout_pool is not None:
+            if "layout" in options:
+                self.layout_id = int(options["layout"])
+            else:
+                self.layout_id = self.layout_pool.sample(
+                    self.np_random,
+                    self.layout_mode,
+                    progress=self._n_resets / max(1, self.curriculum_resets),
+                    index=self.layout_index,
+                    start_fraction=self.curriculum_start,
+                )
+            self._n_resets += 1
+            catan_map = self.layout_pool.catan_map(self.layout_id)
+            self.layout_features = self.layout_pool.layout_features(self.layout_id)
+            self._features_map = catan_map
+        elif "layout" in options:
+            raise ValueError("options['layout'] requires config['layout_pool']")
+
+        # catanatron seeds Python's random from this (0 counts as unseeded)
+        game_seed = int(self.np_random.integers(1, 2**62))
+        self.game = Game(players, seed=game_seed, catan_map=catan_map)
+        if self.opening_book is not None and self.opening_mode == "auto":
+            play_setup(
+                self.game,
+                self.opening_book,
+                self._get_layout_features(self.game.state.board.map),
+                persist=self.layout_pool is not None,
+            )
         self.resource_tracker.reset()
-        self._last_vp = 0
+        # Setup-phase VPs (auto-played openings) aren't rewarded
+        player_state = self.game.state.player_state
+        self._last_vps = np.array([player_state[f"P{p}_VICTORY_POINTS"] for p in range(4)], dtype=np.float32)
+        self._last_vp = player_state[f"P{self.player_id}_VICTORY_POINTS"]
+        self._seat_rewards = np.zeros(4, dtype=np.float32)
+        if self.stream is not None:
+            self._end_stream()
+            self._streaming = self._n_games % self.stream_every_n_games == 0
+            self._n_games += 1
+            if self._streaming:
+                self.stream.publish(self._stream_encoder.reset(self.game))
         
         obs = self._get_obs()
         info = self._get_info()
         return obs, info
 
     def step(self, action_idx):
+        if self.multi_agent:
+            return self._step_acting_seat(action_idx)
+
+        actor = self.game.state.current_player_index
         catan_action = self._map_action(action_idx)
         
         try:
@@ -143,12 +256,41 @@ class CatanEnv(gym.Env):
         truncated = False
         
         self.resource_tracker.update_from_game_state(self.game.state)
+        if self._streaming:
+            self.stream.publish(self._stream_encoder.step(self.game, action_idx, actor))
         
         obs = self._get_obs()
         info = self._get_info()
         
         return obs, reward, terminated, truncated, info
 
+    def _step_acting_seat(self, action_idx):
+        # Same rewards as step(), but for every seat: VP change, +10 for the
+        # winner and -1 to the acting seat for an action that fails.
+        state = self.game.state
+        seat = state.current_player_index
+        self._seat_rewards = np.zeros(4, dtype=np.float32)
+        try:
+            self.game.execute(self._map_action(action_idx))
+        except Exception:
+            self._seat_rewards[seat] = -1.0
+        else:
+            vps = np.array([state.player_state[f"P{p}_VICTORY_POINTS"] for p in range(4)], dtype=np.float32)
+            self._seat_rewards += vps - self._last_vps
+            self._last_vps = vps
+            win_color = self.game.winning_color()
+            if win_color is not None:
+                self._seat_rewards[state.color_to_index[win_color]] += 10.0
+
+        terminated = self.game.winning_color() is not None
+        self.resource_tracker.update_from_game_state(state)
+        if self._streaming:
+            self.stream.publish(self._stream_encoder.step(self.game, action_idx, seat))
+
+        obs = self._get_obs()
+        info = self._get_info()
+        return obs, float(self._seat_rewards[self.player_id]), terminated, False, info
+
     def get_valid_actions_mask(self):
         mask = np.zeros(self.action_space.n, dtype=np.int8)
         
@@ -259,47 +401,46 @@ class CatanEnv(gym.Env):
                     return Action(color, ActionType.END_TURN, None)
             return Action(color, ActionType.END_TURN, None)
 
+    def _viewpoint(self):
+        """Seat the observation is encoded for."""
+        if self.multi_agent:
+            return self.game.state.current_player_index
+        return self.player_id
+
+    def _owner_channels(self, pid):
+        """Owner channel (0-3) of each color."""
+        state = self.game.state
+        if self.multi_agent:
+            return {color: (state.color_to_index[color] - pid) % 4 for color in state.colors}
+        # Color index: RED=0, BLUE=1, WHITE=2, ORANGE=3
+        return {Color.RED: 0, Color.BLUE: 1, Color.WHITE: 2, Color.ORANGE: 3}
+
     def _get_obs(self):
         state = self.game.state
         board = state.board
+        pid = self._viewpoint()
+        owner_channel = self._owner_channels(pid)
         
         # --- 1. Board Grid (19 Hexes) ---
         # Features: 6 Resources + 10 Numbers + 1 Robber = 17
-        board_obs = np.zeros((self.n_hexes, self.n_hex_features), dtype=np.float32)
-        
-        # Use board.map.tiles if available
-        if hasattr(board, 'map') and hasattr(board.map, 'tiles'):
-            # Convert values to list and trust order (consistent sort by key)
-            hex_items = sorted(board.map.tiles.items()) # List of (coord, hex)
-            for i, (coord, hex_obj) in enumerate(hex_items):
-                if i >= self.n_hexes: break
-                
-                # Resource One-Hot (None, Wood, Brick, Sheep, Wheat, Ore) -> 6
-                # Hex values: None, WOOD, BRICK...
-                res_map = {None: 0, "WOOD": 1, "BRICK": 2, "SHEEP": 3, "WHEAT": 4, "ORE": 5, "DESERT": 0} 
-                res_val = getattr(hex_obj, 'resource', None)
-                res_idx = res_map.get(res_val, 0)
-                board_obs[i, res_idx] = 1.0
-                
-                # Number Token One-Hot (2-12)
-                val = getattr(hex_obj, 'number', None)
-                if val and 2 <= val <= 12:
-                    board_obs[i, 6 + (val - 2)] = 1.0
-                    
-                # Robber (Is robber here?)
-                # robber_coordinate might be on board?
-                if hasattr(board, 'robber_coordinate') and board.robber_coordinate == coord:
-                    board_obs[i, 16] = 1.0
-                
+        # Resources / numbers are static per layout and cached; only the robber moves
+        features = self._get_layout_features(board.map)
+        board_obs = features["board"].copy()
+        robber_slot = topology.HEX_BOARD_SLOT[self.hex_to_idx[board.robber_coordinate]]
+        if robber_slot >= 0:
+            board_obs[robber_slot, 16] = 1.0
+
         # --- 2. Vertices (54 Nodes) ---
         # Features: 1 Empty + 4 Settlements (P0-P3) + 4 Cities (P0-P3) + 6 Port Types = 15
         vertex_obs = np.zeros((self.n_vertices, self.n_vertex_features), dtype=np.float32)
-        
+        vertex_obs[:, 9:15] = features["vertex_ports"]
+        if self.opening_features:
+            vertex_obs[:, 15] = self._get_opening_scores(board.map)
+
         buildings = board.buildings
         for node_id, (owner_color, b_type) in buildings.items():
             if 0 <= node_id < self.n_vertices:
-                # Color index: RED=0, BLUE=1, WHITE=2, ORANGE=3
-                c_idx = {Color.RED: 0, Color.BLUE: 1, Color.WHITE: 2, Color.ORANGE: 3}.get(owner_color, 0)
+                c_idx = owner_channel.get(owner_color, 0)
                 if "SETTLEMENT" in str(b_type):
                     vertex_obs[node_id, 1 + c_idx] = 1.0
                 elif "CITY" in str(b_type):
@@ -314,7 +455,7 @@ class CatanEnv(gym.Env):
             edge_tuple_sorted = tuple(sorted(edge_tuple))
             if edge_tuple_sorted in self.edge_to_idx:
                 e_idx = self.edge_to_idx[edge_tuple_sorted]
-                c_idx = {Color.RED: 0, Color.BLUE: 1, Color.WHITE: 2, Color.ORANGE: 3}.get(owner_color, 0)
+                c_idx = owner_channel.get(owner_color, 0)
                 edge_obs[e_idx, 1 + c_idx] = 1.0
         
         # --- 4. Globals ---
@@ -322,16 +463,16 @@ class CatanEnv(gym.Env):
         
         # Player-specific values
         for p in range(4):
-            # Victory Points
-            global_obs[p] = state.player_state.get(f"P{p}_VICTORY_POINTS", 0)
+            # Victory Points, starting with the observing seat
+            global_obs[p] = state.player_state.get(f"P{(pid + p) % 4}_VICTORY_POINTS", 0)
             
         # Self Resources
         r_map_order = ["WOOD", "BRICK", "SHEEP", "WHEAT", "ORE"]
         for idx, res_name in enumerate(r_map_order):
-            global_obs[4 + idx] = state.player_state.get(f"P{self.player_id}_{res_name}_IN_HAND", 0)
+            global_obs[4 + idx] = state.player_state.get(f"P{pid}_{res_name}_IN_HAND", 0)
         
-        # Opponent Resources (from Tracker)
-        opp_res = self.resource_tracker.get_opponent_resources(state, self.player_id)
+        # Opponent Resources (from Tracker, relative to the observing seat)
+        opp_res = self.resource_tracker.get_opponent_resources(state, pid)
         global_obs[9:9+15] = opp_res
         
         return {
@@ -342,8 +483,48 @@ class CatanEnv(gym.Env):
         }
 
 
+    def _get_layout_features(self, catan_map):
+        # Recomputed only when the game's map changes (e.g. a Game set from outside)
+        if catan_map is not self._features_map:
+            layout = layout_from_catan_map(catan_map)
+            features = layout_features(*(part[None] for part in layout))
+            self.layout_features = {k: v[0] for k, v in features.items()}
+            self._features_map = catan_map
+        return self.layout_features
+
+    def _get_opening_scores(self, catan_map):
+        # Book lookup once per board
+        if catan_map is not self._book_map:
+            features = self._get_layout_features(catan_map)
+            # Random boards don't recur; only pool layouts are worth saving
+            entry = self.opening_book.entry_for_map(
+                catan_map, features=features, persist=self.layout_pool is not None
+            )
+            scores = combined_scores(entry)
+            self._book_scores = np.clip(scores / max(float(scores.max()), 1e-6), 0.0, 1.0)
+            self._book_map = catan_map
+        return self._book_scores
+
     def _get_info(self):
+        if self.multi_agent:
+            return {"seat": self._viewpoint(), "seat_rewards": self._seat_rewards.copy()}
         return {}
 
     def render(self):
-        pass
+        # Spectators follow games through the streaming hub; this pushes a
+        # fresh keyframe of the current game to it.
+        if self._streaming:
+            self.stream.publish(self._stream_encoder.keyframe(self.game))
+
+    def close(self):
+        if self.stream is not None:
+            self._end_stream()
+            if isinstance(self.config.get("stream"), (str, tuple)):
+                self.stream.close()  # the publisher this env opened
+        super().close()
+
+    def _end_stream(self):
+        # Tells spectators when a game is abandoned before anyone won
+        frame = self._stream_encoder.end()
+        if frame is not None:
+            self.stream.publish(frame)
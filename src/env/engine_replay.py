@@ -0,0 +1,251 @@
+"""
+Validates BatchedCatanEngine against catanatron.
+
+Plays catanatron games with random (engine-supported) actions, replays the
+same action sequences in a BatchedCatanEngine whose chance events (dice,
+dev card draws, robber victims / steals, discards) are read back from
+catanatron's fully-specified action log, and compares the two states after
+every step.
+"""
+import random
+
+import numpy as np
+from catanatron import Game, Color
+from catanatron.models.enums import ActionPrompt, ActionType, DEVELOPMENT_CARDS, SETTLEMENT, CITY
+from catanatron.models.player import Player
+
+from . import topology as topo
+from . import batched_engine as be
+from .layout_pool import layout_from_catan_map
+
+# CatanEnv's color -> channel order
+COLOR_ORDER = [Color.RED, Color.BLUE, Color.WHITE, Color.ORANGE]
+
+# Action types the engine (and CatanEnv) can execute
+SUPPORTED_ACTION_TYPES = {
+    ActionType.BUILD_SETTLEMENT,
+    ActionType.BUILD_CITY,
+    ActionType.BUILD_ROAD,
+    ActionType.BUY_DEVELOPMENT_CARD,
+    ActionType.ROLL,
+    ActionType.PLAY_KNIGHT_CARD,
+    ActionType.PLAY_ROAD_BUILDING,
+    ActionType.MOVE_ROBBER,
+    ActionType.DISCARD,
+    ActionType.END_TURN,
+}
+
+PROMPT_CODES = {
+    ActionPrompt.BUILD_INITIAL_SETTLEMENT: be.BUILD_INITIAL_SETTLEMENT,
+    ActionPrompt.BUILD_INITIAL_ROAD: be.BUILD_INITIAL_ROAD,
+    ActionPrompt.PLAY_TURN: be.PLAY_TURN,
+    ActionPrompt.DISCARD: be.DISCARD,
+    ActionPrompt.MOVE_ROBBER: be.MOVE_ROBBER,
+}
+
+
+def action_to_index(action):
+    """Maps a catanatron Action to its CatanEnv action index (None if unsupported)."""
+    act_type, value = action.action_type, action.value
+    if act_type in (ActionType.BUILD_SETTLEMENT, ActionType.BUILD_CITY):
+        return value
+    if act_type == ActionType.BUILD_ROAD:
+        return be.ROAD_OFFSET + topo.EDGE_TO_IDX[tuple(sorted(value))]
+    if act_type == ActionType.BUY_DEVELOPMENT_CARD:
+        return be.BUY_DEV_CARD
+    if act_type == ActionType.ROLL:
+        return be.ROLL
+    if act_type == ActionType.PLAY_KNIGHT_CARD:
+        return be.PLAY_KNIGHT
+    if act_type == ActionType.PLAY_ROAD_BUILDING:
+        return be.PLAY_ROAD_BUILDING
+    if act_type == ActionType.MOVE_ROBBER:
+        return be.ROBBER_OFFSET + topo.HEX_TO_IDX[value[0]]
+    if act_type in (ActionType.DISCARD, ActionType.END_TURN):
+        return be.END_TURN
+    return None
+
+
+class ReplayEngine(be.BatchedCatanEngine):
+    """Engine whose chance events come from logged catanatron actions."""
+
+    def __init__(self, n_games):
+        super().__init__(n_games)
+        self.games = [None] * n_games
+        self.logged = [None] * n_games  # fully-specified action per row, set before step()
+
+    def _seat(self, i, color):
+        return self.games[i].state.color_to_index[color]
+
+    def _roll_dice(self, idx):
+        return np.array([sum(self.logged[i].value) for i in idx], dtype=np.int64)
+
+    def _draw_dev_cards(self, idx):
+        return np.array([DEVELOPMENT_CARDS.index(self.logged[i].value) for i in idx], dtype=np.int64)
+
+    def _choose_victims(self, idx, candidates):
+        victims = []
+        for i in idx:
+            color = self.logged[i].value[1]
+            victims.append(-1 if color is None else self._seat(i, color))
+        return np.array(victims, dtype=np.int64)
+
+    def _steal_cards(self, idx, victims):
+        return np.array([topo.RESOURCES.index(self.logged[i].value[2]) for i in idx], dtype=np.int64)
+
+    def _discard_cards(self, idx, seats):
+        discarded = np.zeros((len(idx), 5), dtype=np.int16)
+        for row, i in enumerate(idx):
+            for resource in self.logged[i].value:
+                discarded[row, topo.RESOURCES.index(resource)] += 1
+        return discarded
+
+
+def expected_mask(game):
+    """CatanEnv action indices catanatron currently allows, restricted to supported types."""
+    mask = np.zeros(be.N_ACTIONS, dtype=np.int8)
+    for action in game.state.playable_actions:
+        if action.action_type in SUPPORTED_ACTION_TYPES:
+            mask[action_to_index(action)] = 1
+    return mask
+
+
+def compare_state(engine, i, game):
+    """Returns a list of human-readable mismatches between engine row i and game."""
+    state = game.state
+    seats = state.color_to_index
+    ps = state.player_state
+    problems = []
+
+    def check(name, engine_value, game_value):
+        if not np.array_equal(np.asarray(engine_value), np.asarray(game_value)):
+            problems.append(f"{name}: engine={engine_value} catanatron={game_value}")
+
+    check("prompt", engine.prompt[i], PROMPT_CODES[state.current_prompt])
+    check("current_player", engine.current_player[i], state.current_player_index)
+    check("current_turn", engine.current_turn[i], state.current_turn_index)
+    check("road_building", engine.is_road_building[i], state.is_road_building)
+    check("robber", engine.robber[i], topo.HEX_TO_IDX[state.board.robber_coordinate])
+    check("bank", engine.bank[i], state.resource_freqdeck)
+    check("dev_deck", engine.dev_deck[i].sum(), len(state.development_listdeck))
+    check("road_lengths", engine.road_lengths[i], [state.board.road_lengths.get(c, 0) for c in state.colors])
+
+    for p in range(be.N_PLAYERS):
+        check(f"P{p} hand", engine.hands[i, p], [ps[f"P{p}_{r}_IN_HAND"] for r in topo.RESOURCES])
+        check(f"P{p} dev hand", engine.dev_hand[i, p], [ps[f"P{p}_{d}_IN_HAND"] for d in DEVELOPMENT_CARDS])
+        check(f"P{p} dev played", engine.dev_played[i, p, :4], [ps[f"P{p}_PLAYED_{d}"] for d in DEVELOPMENT_CARDS[:4]])
+        check(f"P{p} vp", engine.victory_points[i, p], ps[f"P{p}_VICTORY_POINTS"])
+        check(f"P{p} actual vp", engine.actual_victory_points[i, p], ps[f"P{p}_ACTUAL_VICTORY_POINTS"])
+        check(f"P{p} has road", engine.road_owner[i] == p, ps[f"P{p}_HAS_ROAD"])
+        check(f"P{p} has army", engine.army_owner[i] == p, ps[f"P{p}_HAS_ARMY"])
+        check(f"P{p} roads left", engine.roads_available[i, p], ps[f"P{p}_ROADS_AVAILABLE"])
+        check(f"P{p} settlements left", engine.settlements_available[i, p], ps[f"P{p}_SETTLEMENTS_AVAILABLE"])
+        check(f"P{p} cities left", engine.cities_available[i, p], ps[f"P{p}_CITIES_AVAILABLE"])
+
+    owner = np.full(topo.N_NODES, -1)
+    level = np.zeros(topo.N_NODES)
+    for node_id, (color, b_type) in state.board.buildings.items():
+        owner[node_id] = seats[color]
+        level[node_id] = 1 if b_type == SETTLEMENT else 2 if b_type == CITY else 0
+    check("node owners", engine.node_owner[i], owner)
+    check("node levels", engine.node_level[i], level)
+
+    edge_owner = np.full(topo.N_EDGES, -1)
+    for edge, color in state.board.roads.items():
+        edge_owner[topo.EDGE_TO_IDX[tuple(sorted(edge))]] = seats[color]
+    check("edge owners", engine.edge_owner[i], edge_owner)
+
+    check("mask", np.flatnonzero(engine.action_masks()[i]), np.flatnonzero(expected_mask(game)))
+    return problems
+
+
+def compare_observation(engine, i, game, env):
+    """Compares engine.observe() for row i with CatanEnv._get_obs() on game."""
+    env.game = game
+    expected = env._get_obs()
+    obs = {k: v[i] for k, v in engine.observe(env.player_id).items()}
+
+    # CatanEnv indexes vertex / edge owners by color, the engine by seat
+    seat_of_channel = [game.state.color_to_index.get(c) for c in COLOR_ORDER]
+    vertices = obs["vertices"].copy()
+    edges = obs["edges"].copy()
+    for k, seat in enumerate(seat_of_channel):
+        vertices[:, 1 + k] = obs["vertices"][:, 1 + seat]
+        vertices[:, 5 + k] = obs["vertices"][:, 5 + seat]
+        edges[:, 1 + k] = obs["edges"][:, 1 + seat]
+    obs["vertices"], obs["edges"] = vertices, edges
+
+    return [f"obs {k}" for k in expected if not np.array_equal(obs[k], expected[k])]
+
+
+def replay_random_games(n_games=8, max_steps=2000, seed=0, env=None, games=None):
+    """
+    Plays n_games catanatron games in lockstep with one ReplayEngine.
+
+    Game g of a seed is the same in every process and batch (its board,
+    dice and action choices only depend on seed and g), so a mismatch can
+    be replayed alone with games=[g].
+
+    Args:
+        n_games: number of games (= engine batch size).
+        max_steps: decisions per game before stopping.
+        seed: seeds catanatron and the action choosers.
+        env: optional CatanEnv; when given, observations are compared too.
+        games: game numbers to play instead of range(n_games).
+
+    Returns:
+        (mismatches, steps): list of (game, step, action, problems) and the
+        number of decisions replayed.
+    """
+    numbers = list(range(n_games) if games is None else games)
+    n_games = len(numbers)
+    choosers = [random.Random(seed * 1000 + g) for g in numbers]
+    engine = ReplayEngine(n_games)
+    games = []
+    # catanatron draws from the global random module; give each game its own stream
+    random_states = []
+    for g in numbers:
+        players = [Player(c) for c in COLOR_ORDER]
+        games.append(Game(players, seed=seed * 1000 + g + 1))
+        random_states.append(random.getstate())
+    engine.games = games
+    layouts = [layout_from_catan_map(game.state.board.map) for game in games]
+    engine.reset(layouts=tuple(np.stack(parts) for parts in zip(*layouts)))
+
+    mismatches = []
+    steps = 0
+    active = [True] * n_games
+    for step in range(max_steps):
+        actions = np.full(n_games, -1, dtype=np.int64)
+        for g, game in enumerate(games):
+            if not active[g]:
+                continue
+            # playable_actions' order depends on hash order; sort so a seed replays the same games
+            choices = sorted(
+                (a for a in game.state.playable_actions if a.action_type in SUPPORTED_ACTION_TYPES), key=repr
+            )
+            action = choosers[g].choice(choices)
+            random.setstate(random_states[g])
+            engine.logged[g] = game.execute(action)
+            random_states[g] = random.getstate()
+            actions[g] = action_to_index(action)
+
+        if not any(active):
+            break
+        applied = engine.step(actions)
+        for g, game in enumerate(games):
+            if not active[g]:
+                continue
+            steps += 1
+            problems = [] if applied[g] else ["engine rejected the action"]
+            problems += compare_state(engine, g, game)
+            if env is not None:
+                problems += compare_observation(engine, g, game, env)
+            if problems:
+                mismatches.append((numbers[g], step, engine.logged[g], problems))
+                active[g] = False
+            elif game.winning_color() is not None:
+                if engine.winners()[g] != game.state.color_to_index[game.winning_color()]:
+                    mismatches.append((numbers[g], step, engine.logged[g], ["winner"]))
+                active[g] = False
+    return mismatches, steps
@@ -0,0 +1,220 @@
+"""
+Seeded pool of board layouts with cached per-layout static features.
+
+A layout is the per-game part of the board: which resource and number sits
+on each of the 19 hexes and which trade type each of the 9 ports offers
+(codes as in topology.RESOURCE_CODES). A LayoutPool pregenerates N of them
+from a seed, precomputes their static observation slices once, and is
+stored on disk as a single .npz so training and evaluation can share the
+exact same boards.
+
+Cached features per layout:
+    board        (19, 17) CatanEnv board rows without the robber channel
+    vertex_ports (54, 6)  port type per vertex (0 = 3:1, 1-5 = RESOURCES),
+                          i.e. vertex observation channels 9-14
+    vertex_pips  (54, 5)  dice dots per resource produced at each vertex
+
+Usage:
+    python -m src.env.layout_pool --size 1000 --seed 0 --out layouts.npz
+"""
+import argparse
+
+import numpy as np
+from catanatron.models.map import BASE_MAP_TEMPLATE, CatanMap, initialize_tiles
+
+from . import topology as topo
+
+CODE_TO_RESOURCE = {code: res for res, code in topo.RESOURCE_CODES.items()}
+
+# Dice dots per number token (index = number)
+NUMBER_DOTS = np.array([0, 0, 1, 2, 3, 4, 5, 0, 5, 4, 3, 2, 1], dtype=np.float32)
+
+SAMPLING_MODES = ("uniform", "curriculum", "fixed")
+
+
+def random_layouts(rng, n):
+    """
+    Deals n random boards from the base map template (same distribution as
+    catanatron: resources, numbers and ports are independently shuffled).
+
+    Returns:
+        (hex_resource (n, 19), hex_number (n, 19), port_resource (n, 9)) int8 arrays.
+    """
+    resources = rng.permuted(np.tile(topo.TILE_RESOURCE_POOL, (n, 1)), axis=1)
+    numbers = rng.permuted(np.tile(topo.NUMBER_POOL, (n, 1)), axis=1)
+    ports = rng.permuted(np.tile(topo.PORT_RESOURCE_POOL, (n, 1)), axis=1)
+
+    # Numbers go to non-desert tiles in template order
+    template_numbers = np.zeros_like(resources)
+    template_numbers[resources != 0] = numbers.reshape(-1)
+
+    hex_resource = np.zeros((n, topo.N_HEXES), dtype=np.int8)
+    hex_number = np.zeros((n, topo.N_HEXES), dtype=np.int8)
+    hex_resource[:, topo.TEMPLATE_HEXES] = resources
+    hex_number[:, topo.TEMPLATE_HEXES] = template_numbers
+    return hex_resource, hex_number, ports.astype(np.int8)
+
+
+def layout_from_catan_map(catan_map):
+    """
+    Extracts the layout arrays from a catanatron CatanMap.
+
+    Returns:
+        (hex_resource (19,), hex_number (19,), port_resource (9,)) int8 arrays.
+    """
+    hex_resource = np.zeros(topo.N_HEXES, dtype=np.int8)
+    hex_number = np.zeros(topo.N_HEXES, dtype=np.int8)
+    for coord, tile in catan_map.land_tiles.items():
+        h = topo.HEX_TO_IDX[coord]
+        hex_resource[h] = topo.RESOURCE_CODES[tile.resource]
+        hex_number[h] = tile.number or 0
+
+    port_resource = np.zeros(topo.N_PORTS, dtype=np.int8)
+    for port_id, port in catan_map.ports_by_id.items():
+        port_resource[port_id] = topo.RESOURCE_CODES[port.resource]
+    return hex_resource, hex_number, port_resource
+
+
+def catan_map_from_layout(hex_resource, hex_number, port_resource):
+    """Builds the catanatron CatanMap for one layout (inverse of layout_from_catan_map)."""
+    resources = [CODE_TO_RESOURCE[int(c)] for c in hex_resource[topo.TEMPLATE_HEXES]]
+    numbers = [int(n) for n in hex_number[topo.TEMPLATE_HEXES] if n != 0]
+    ports = [CODE_TO_RESOURCE[int(c)] for c in port_resource]
+    # initialize_tiles pops from the end of each list while walking the template
+    tiles = initialize_tiles(BASE_MAP_TEMPLATE, numbers[::-1], ports[::-1], resources[::-1])
+    return CatanMap.from_tiles(tiles)
+
+
+def layout_features(hex_resource, hex_number, port_resource):
+    """
+    Static observation slices for a batch of layouts (leading dimension n).
+
+    Returns:
+        dict with "board" (n, 19, 17), "vertex_ports" (n, 54, 6) and
+        "vertex_pips" (n, 54, 5) float32 arrays (see module docstring).
+    """
+    hex_resource = np.asarray(hex_resource, dtype=np.int64)
+    hex_number = np.asarray(hex_number, dtype=np.int64)
+    port_resource = np.asarray(port_resource, dtype=np.int64)
+    n = len(hex_resource)
+    rows = np.arange(n)[:, None]
+
+    # --- Board rows (see topology.BOARD_SLOTS) ---
+    kind, ref = topo.BOARD_SLOTS[:, 0], topo.BOARD_SLOTS[:, 1]
+    land, port = kind == 0, kind == 1
+    slot_res = np.zeros((n, topo.N_HEXES), dtype=np.int64)
+    slot_num = np.zeros((n, topo.N_HEXES), dtype=np.int64)
+    slot_res[:, land] = hex_resource[:, ref[land]]
+    slot_num[:, land] = hex_number[:, ref[land]]
+    slot_res[:, port] = port_resource[:, ref[port]]
+
+    board = np.zeros((n, topo.N_HEXES, 17), dtype=np.float32)
+    board[rows, np.arange(topo.N_HEXES)[None, :], slot_res] = 1.0
+    g, s = np.nonzero(slot_num >= 2)
+    board[g, s, 6 + slot_num[g, s] - 2] = 1.0
+
+    # --- Vertex ports ---
+    vertex_ports = np.zeros((n, topo.N_NODES, 6), dtype=np.float32)
+    for p in range(topo.N_PORTS):
+        for node in topo.PORT_NODES[p]:
+            vertex_ports[np.arange(n), node, port_resource[:, p]] = 1.0
+
+    # --- Vertex pips ---
+    hex_dots = np.zeros((n, topo.N_HEXES, 6), dtype=np.float32)
+    hex_dots[rows, np.arange(topo.N_HEXES)[None, :], hex_resource] = NUMBER_DOTS[hex_number]
+    vertex_pips = topo.NODE_HEX_MATRIX @ hex_dots[:, :, 1:]
+
+    return {"board": board, "vertex_ports": vertex_ports, "vertex_pips": vertex_pips}
+
+
+class LayoutPool:
+    """
+    Pregenerated, seedable collection of board layouts and their cached features.
+
+    Attributes:
+        hex_resource, hex_number, port_resource: (N, ...) layout arrays.
+        features: dict of (N, ...) arrays from layout_features.
+        seed: seed the pool was generated from (None if unknown).
+    """
+
+    def __init__(self, hex_resource, hex_number, port_resource, features=None, seed=None):
+        self.hex_resource = np.asarray(hex_resource, dtype=np.int8)
+        self.hex_number = np.asarray(hex_number, dtype=np.int8)
+        self.port_resource = np.asarray(port_resource, dtype=np.int8)
+        self.features = features or layout_features(self.hex_resource, self.hex_number, self.port_resource)
+        self.seed = seed
+        self._maps = {}
+
+    def __len__(self):
+        return len(self.hex_resource)
+
+    @classmethod
+    def generate(cls, n, seed=None):
+        hex_resource, hex_number, port_resource = random_layouts(np.random.default_rng(seed), n)
+        return cls(hex_resource, hex_number, port_resource, seed=seed)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            features = {k[len("feature_"):]: data[k] for k in data.files if k.startswith("feature_")}
+            seed = int(data["seed"]) if data["seed"] >= 0 else None
+            return cls(data["hex_resource"], data["hex_number"], data["port_resource"], features, seed)
+
+    def save(self, path):
+        np.savez_compressed(
+            path,
+            hex_resource=self.hex_resource,
+            hex_number=self.hex_number,
+            port_resource=self.port_resource,
+            seed=np.int64(-1 if self.seed is None else self.seed),
+            **{f"feature_{k}": v for k, v in self.features.items()},
+        )
+
+    def layouts(self, idx):
+        """(hex_resource, hex_number, port_resource) for the given indices."""
+        return self.hex_resource[idx], self.hex_number[idx], self.port_resource[idx]
+
+    def layout_features(self, i):
+        """Cached features of layout i."""
+        return {k: v[i] for k, v in self.features.items()}
+
+    def catan_map(self, i):
+        """catanatron CatanMap of layout i, built once and reused (maps are read-only)."""
+        i = int(i)
+        if i not in self._maps:
+            self._maps[i] = catan_map_from_layout(*self.layouts(i))
+        return self._maps[i]
+
+    def sample(self, rng, mode="uniform", size=None, progress=1.0, index=0, start_fraction=0.1):
+        """
+        Draws layout indices.
+
+        Args:
+            rng: np.random.Generator.
+            mode: "uniform" over the whole pool, "curriculum" uniform over
+                the first fraction of the pool, growing linearly from
+                start_fraction to 1 as progress goes 0 -> 1, or "fixed"
+                (always `index`).
+            size: None for a single index, else the number of indices.
+        """
+        if mode == "fixed":
+            return index if size is None else np.full(size, index, dtype=np.int64)
+        if mode == "uniform":
+            high = len(self)
+        elif mode == "curriculum":
+            fraction = start_fraction + (1.0 - start_fraction) * min(max(progress, 0.0), 1.0)
+            high = max(1, int(round(fraction * len(self))))
+        else:
+            raise ValueError(f"Unknown layout sampling mode '{mode}', expected one of {SAMPLING_MODES}")
+        picks = rng.integers(0, high, size=size)
+        return int(picks) if size is None else picks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generates a LayoutPool and saves it as .npz")
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="layouts.npz")
+    args = parser.parse_args()
+    LayoutPool.generate(args.size, seed=args.seed).save(args.out)
+    print(f"Saved {args.size} layouts (seed {args.seed}) to {args.out}")
@@ -0,0 +1,302 @@
+"""
+Opening book: initial-placement scores per board layout, cached on disk.
+
+The setup phase (actions 0-125: two settlements and two roads per seat)
+depends only on the static board, so its placements can be scored once per
+layout instead of being re-learned in every game. Each book entry holds,
+per vertex (54,):
+    production  pips weighted by how scarce each resource is on this board
+    diversity   number of distinct resources produced
+    ports       port access (3:1 = 1, 2:1 = that resource's board share)
+    score       production + DIVERSITY_WEIGHT * diversity + PORT_WEIGHT * ports
+and optionally, when built with a trained model (see policy_value_scores):
+    policy      the policy's probability of settling there on an empty board
+    value       the value estimate right after settling there
+
+Entries are stored as <path>/<layout_hash>.npz. Only layouts that recur (a
+LayoutPool's, or anything passed to build_book) are written; one-off random
+boards are scored and kept in memory only. Policy / value scores belong to
+the model that produced them, so keep a separate book path per model.
+
+Usage:
+    python -m src.env.opening_book --pool layouts.npz --out books/heuristic
+    python -m src.env.opening_book --pool layouts.npz --out books/ppo --model ppo_catan_final.zip
+"""
+import argparse
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+from catanatron import Action
+from catanatron.models.enums import ActionType
+
+from . import topology as topo
+from .layout_pool import NUMBER_DOTS, LayoutPool, layout_features, layout_from_catan_map
+
+DIVERSITY_WEIGHT = 0.5
+PORT_WEIGHT = 0.5
+# Score terms mixed in from a model, relative to the normalized heuristic score
+POLICY_WEIGHT = 1.0
+VALUE_WEIGHT = 1.0
+
+OPENING_MODES = ("auto", "features")
+
+
+def layout_hash(hex_resource, hex_number, port_resource):
+    """Stable key of a layout (hex string)."""
+    digest = hashlib.sha1()
+    for part in (hex_resource, hex_number, port_resource):
+        digest.update(np.asarray(part, dtype=np.int8).tobytes())
+    return digest.hexdigest()
+
+
+def _single_layout_features(hex_resource, hex_number, port_resource):
+    layout = (np.asarray(part)[None] for part in (hex_resource, hex_number, port_resource))
+    return {k: v[0] for k, v in layout_features(*layout).items()}
+
+
+def heuristic_scores(hex_resource, hex_number, vertex_pips, vertex_ports):
+    """Heuristic book entry for one layout (see module docstring)."""
+    hex_resource = np.asarray(hex_resource, dtype=np.int64)
+    board_pips = np.zeros(6, dtype=np.float32)
+    np.add.at(board_pips, hex_resource, NUMBER_DOTS[np.asarray(hex_number, dtype=np.int64)])
+    board_pips = board_pips[1:]
+
+    # Scarcer resources are worth more per pip
+    weights = board_pips.mean() / np.maximum(board_pips, 1.0)
+    production = vertex_pips @ weights
+    diversity = (vertex_pips > 0).sum(axis=1).astype(np.float32)
+    port_values = np.concatenate([[1.0], board_pips / board_pips.mean()]).astype(np.float32)
+    ports = vertex_ports @ port_values
+
+    return {
+        "production": production.astype(np.float32),
+        "diversity": diversity,
+        "ports": ports.astype(np.float32),
+        "score": (production + DIVERSITY_WEIGHT * diversity + PORT_WEIGHT * ports).astype(np.float32),
+    }
+
+
+def policy_value_scores(model, env):
+    """
+    Scores the first settlement of env's current game (just reset) with a
+    trained MaskablePPO: the policy's probability of each spot, and the value
+    of the position after settling there.
+
+    Returns:
+        (policy (54,), value (54,)) float32 arrays; illegal spots are 0.
+    """
+    import torch as th
+
+    mask = env.get_valid_actions_mask()
+    obs_tensor, _ = model.policy.obs_to_tensor(env._get_obs())
+    with th.no_grad():
+        distribution = model.policy.get_distribution(obs_tensor, action_masks=mask[None].astype(bool))
+        policy = distribution.distribution.probs[0, :topo.N_NODES].cpu().numpy()
+
+    value = np.zeros(topo.N_NODES, dtype=np.float32)
+    game = env.game
+    color = game.state.current_color()
+    try:
+        for node in np.flatnonzero(mask[:topo.N_NODES]):
+            env.game = game.copy()
+            env.game.execute(Action(color, ActionType.BUILD_SETTLEMENT, int(node)))
+            obs_tensor, _ = model.policy.obs_to_tensor(env._get_obs())
+            with th.no_grad():
+                value[node] = model.policy.predict_values(obs_tensor).item()
+    finally:
+        env.game = game
+    return policy.astype(np.float32), value
+
+
+def combined_scores(entry):
+    """Single per-vertex ranking from an entry, mixing in model scores when present."""
+    score = entry["score"] / max(float(entry["score"].max()), 1e-6)
+    if "policy" in entry:
+        score = score + POLICY_WEIGHT * entry["policy"] / max(float(entry["policy"].max()), 1e-6)
+    if "value" in entry:
+        value = entry["value"]
+        spread = float(value.max() - value.min())
+        score = score + VALUE_WEIGHT * (value - value.min()) / max(spread, 1e-6)
+    return score
+
+
+class OpeningBook:
+    """
+    Per-layout opening scores, looked up in memory, then on disk, and
+    computed (and saved) on a miss.
+
+    Args:
+        path: directory of the on-disk index (None keeps entries in memory only).
+        max_cached: entries kept in memory.
+    """
+
+    def __init__(self, path=None, max_cached=10000):
+        self.path = path
+        self.max_cached = max_cached
+        self._cache = {}
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    def __len__(self):
+        if self.path is None:
+            return len(self._cache)
+        return sum(name.endswith(".npz") for name in os.listdir(self.path))
+
+    def _file(self, key):
+        return os.path.join(self.path, f"{key}.npz")
+
+    def _remember(self, key, entry):
+        if len(self._cache) >= self.max_cached:
+            del self._cache[next(iter(self._cache))]
+        self._cache[key] = entry
+
+    def lookup(self, key):
+        """Cached entry for a layout hash, or None."""
+        if key in self._cache:
+            return self._cache[key]
+        if self.path is not None and os.path.exists(self._file(key)):
+            with np.load(self._file(key)) as data:
+                entry = {k: data[k] for k in data.files}
+            self._remember(key, entry)
+            return entry
+        return None
+
+    def store(self, key, entry):
+        self._remember(key, entry)
+        if self.path is not None:
+            # Write then rename, so concurrent env processes never read a partial file
+            fd, tmp = tempfile.mkstemp(suffix=".npz", dir=self.path)
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **entry)
+            os.replace(tmp, self._file(key))
+
+    def entry(self, hex_resource, hex_number, port_resource, features=None, persist=True):
+        """
+        Book entry of a layout; features may pass its cached layout_features.
+        A computed entry is only written to disk with persist (layouts that
+        can recur); otherwise it stays in memory.
+        """
+        key = layout_hash(hex_resource, hex_number, port_resource)
+        entry = self.lookup(key)
+        if entry is None:
+            if features is None:
+                features = _single_layout_features(hex_resource, hex_number, port_resource)
+            entry = heuristic_scores(hex_resource, hex_number, features["vertex_pips"], features["vertex_ports"])
+            if persist:
+                self.store(key, entry)
+            else:
+                self._remember(key, entry)
+        return entry
+
+    def entry_for_map(self, catan_map, features=None, persist=True):
+        return self.entry(*layout_from_catan_map(catan_map), features=features, persist=persist)
+
+
+# ----------------------------------------------------------------------
+# Playing the setup phase
+# ----------------------------------------------------------------------
+def _open_nodes(board):
+    """(54,) bool: nodes where the distance rule still allows a settlement."""
+    open_nodes = np.ones(topo.N_NODES + 1, dtype=bool)
+    occupied = np.array(list(board.buildings), dtype=np.int64)
+    open_nodes[occupied] = False
+    open_nodes[topo.NODE_NEIGHBORS[occupied].reshape(-1)] = False
+    return open_nodes[:topo.N_NODES]
+
+
+def choose_settlement(scores, state, vertex_pips=None):
+    """
+    Best legal initial settlement by scores. With the layout's vertex_pips,
+    the second settlement also earns DIVERSITY_WEIGHT per resource the
+    seat's first settlement doesn't produce.
+    """
+    nodes = np.array([a.value for a in state.playable_actions if a.action_type == ActionType.BUILD_SETTLEMENT])
+    value = scores[nodes].astype(np.float32)
+    color = state.current_color()
+    owned = [n for n, (c, _) in state.board.buildings.items() if c == color]
+    if vertex_pips is not None and owned:
+        produced = vertex_pips[owned].sum(axis=0) > 0
+        value += DIVERSITY_WEIGHT * ((vertex_pips[nodes] > 0) & ~produced).sum(axis=1)
+    return int(nodes[np.argmax(value)])
+
+
+def choose_road(scores, state):
+    """Initial road pointing at the best open settlement spot two steps away."""
+    roads = [a.value for a in state.playable_actions if a.action_type == ActionType.BUILD_ROAD]
+    open_nodes = _open_nodes(state.board)
+
+    def target(edge):
+        a, b = edge
+        # The endpoint away from the new settlement
+        near = b if a in state.board.buildings else a
+        reachable = [n for n in topo.NODE_NEIGHBORS[near] if n < topo.N_NODES and open_nodes[n]]
+        return max((scores[n] for n in reachable), default=-np.inf)
+
+    return max(roads, key=target)
+
+
+def play_setup(game, book, features=None, persist=True):
+    """
+    Plays every seat's initial settlements and roads from the book.
+
+    Args:
+        game: catanatron Game at the start of its setup phase.
+        book: OpeningBook.
+        features: optional cached layout_features of game's layout.
+        persist: whether a newly scored layout is saved (see OpeningBook.entry).
+    """
+    layout = layout_from_catan_map(game.state.board.map)
+    if features is None:
+        features = _single_layout_features(*layout)
+    scores = combined_scores(book.entry(*layout, features=features, persist=persist))
+
+    state = game.state
+    while state.is_initial_build_phase and game.winning_color() is None:
+        color = state.current_color()
+        if state.current_prompt.name == "BUILD_INITIAL_SETTLEMENT":
+            node = choose_settlement(scores, state, features["vertex_pips"])
+            game.execute(Action(color, ActionType.BUILD_SETTLEMENT, node))
+        else:
+            game.execute(Action(color, ActionType.BUILD_ROAD, choose_road(scores, state)))
+
+
+# ----------------------------------------------------------------------
+# Building books offline
+# ----------------------------------------------------------------------
+def build_book(book, pool, model=None, env_config=None):
+    """
+    Fills book with every layout of a LayoutPool, adding policy / value
+    scores from a trained MaskablePPO when model is given (env_config must
+    match the observation mode the model was trained with).
+    """
+    from .catan_env import CatanEnv
+
+    env = CatanEnv({**(env_config or {}), "layout_pool": pool}) if model is not None else None
+    for i in range(len(pool)):
+        layout = pool.layouts(i)
+        entry = dict(book.entry(*layout, features=pool.layout_features(i)))
+        if env is not None and "policy" not in entry:
+            env.reset(seed=i, options={"layout": i})
+            entry["policy"], entry["value"] = policy_value_scores(model, env)
+            book.store(layout_hash(*layout), entry)
+    return book
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precomputes an opening book for a layout pool")
+    parser.add_argument("--pool", required=True, help="LayoutPool .npz")
+    parser.add_argument("--out", required=True, help="Book directory")
+    parser.add_argument("--model", help="MaskablePPO .zip to add policy / value scores")
+    parser.add_argument("--multi-agent", action="store_true", help="Model was trained on seat-relative observations")
+    args = parser.parse_args()
+
+    model = None
+    if args.model:
+        from sb3_contrib.ppo_mask import MaskablePPO
+        model = MaskablePPO.load(args.model, device="cpu")
+    pool = LayoutPool.load(args.pool)
+    env_config = {"multi_agent": True} if args.multi_agent else None
+    book = build_book(OpeningBook(args.out), pool, model, env_config)
+    print(f"Book at {args.out} covers {len(book)} layouts")
@@ -0,0 +1,398 @@
+"""
+Live game streaming: delta-encoded frames from CatanEnv to websocket spectators.
+
+    CatanEnv(config={"stream": "127.0.0.1:8765"})      # in any number of processes
+                                                        # ("stream_every_n_games": n streams a subset)
+        -> UDPPublisher    (one datagram per step, never blocks, drops when busy)
+        -> BroadcastHub    (server: keeps each game's full state, fans out)
+        -> /ws websocket   (per-client bounded queue, drops for slow clients)
+
+Frames are JSON objects:
+    {"type": "key", "game": id, "seq": n, "state": {...}}    full state
+    {"type": "delta", "game": id, "seq": n, "action": a, "actor": seat, ...}
+A delta holds only what changed since the previous frame of that game:
+"buildings" [[node, seat, level]], "roads" [[edge, seat]], "robber" hex,
+"hands" [[seat, [5 resources]]], "vps" [4], "current" seat, "turn", and
+"winner" (seat) plus "done" once the game is over. Keyframes are sent when
+a game starts, every keyframe_interval frames, to clients when they connect,
+and to clients that had to drop frames of a game.
+    {"type": "end", "game": id, "seq": n}
+ends a game that stopped without a winner (env reset or closed mid-game,
+truncation), or that the hub expired after idle_timeout seconds without frames.
+
+Node / edge / hex indices are topology's; owners are seat indices.
+
+Usage (requires fastapi, uvicorn):
+    python -m src.env.streaming --port 8000 --udp-port 8765
+"""
+import argparse
+import asyncio
+import json
+import socket
+import time
+
+import numpy as np
+
+from . import topology as topo
+from .layout_pool import layout_from_catan_map
+
+DEFAULT_UDP_PORT = 8765
+DEFAULT_IDLE_TIMEOUT = 300.0
+
+
+def encode_frame(frame):
+    return json.dumps(frame, separators=(",", ":"))
+
+
+def apply_delta(state, frame):
+    """Applies a delta frame to a full state (as in a keyframe), in place."""
+    for node, seat, level in frame.get("buildings", ()):
+        state["node_owner"][node] = seat
+        state["node_level"][node] = level
+    for edge, seat in frame.get("roads", ()):
+        state["edge_owner"][edge] = seat
+    for seat, hand in frame.get("hands", ()):
+        state["hands"][seat] = hand
+    for key in ("robber", "vps", "current", "turn", "winner"):
+        if key in frame:
+            state[key] = frame[key]
+    return state
+
+
+# ----------------------------------------------------------------------
+# Env side
+# ----------------------------------------------------------------------
+class GameStreamEncoder:
+    """Turns a catanatron game into keyframes and per-step deltas."""
+
+    def __init__(self, keyframe_interval=100):
+        self.keyframe_interval = keyframe_interval
+        self.game_id = None
+        self.seq = 0
+        self._layout = None
+        self._prev = None
+
+    def _capture(self, game, prev=None):
+        state = game.state
+        seats = state.color_to_index
+        ps = state.player_state
+        keys = self._keys
+
+        # Pieces are only ever added (or upgraded), so unchanged counts mean unchanged pieces
+        building_count = (len(state.board.buildings), sum(ps[k] for k in keys["cities"]))
+        if prev is not None and prev["building_count"] == building_count:
+            node_owner, node_level = prev["node_owner"], prev["node_level"]
+        else:
+            node_owner = np.full(topo.N_NODES, -1, dtype=np.int64)
+            node_level = np.zeros(topo.N_NODES, dtype=np.int64)
+            for node, (color, building) in state.board.buildings.items():
+                node_owner[node] = seats[color]
+                node_level[node] = 1 if building == "SETTLEMENT" else 2
+
+        road_count = len(state.board.roads)
+        if prev is not None and prev["road_count"] == road_count:
+            edge_owner = prev["edge_owner"]
+        else:
+            edge_owner = np.full(topo.N_EDGES, -1, dtype=np.int64)
+            for edge, color in state.board.roads.items():
+                edge_owner[topo.EDGE_TO_IDX[tuple(sorted(edge))]] = seats[color]
+
+        hands = [[ps[k] for k in seat_keys] for seat_keys in keys["hands"]]
+        vps = [int(ps[k]) for k in keys["vps"]]
+        # Same rule as game.winning_color(), without rebuilding the player keys
+        winner = None
+        for seat, key in enumerate(keys["actual_vps"]):
+            if ps[key] >= game.vps_to_win:
+                winner = seat
+        return {
+            "building_count": building_count,
+            "road_count": road_count,
+            "node_owner": node_owner,
+            "node_level": node_level,
+            "edge_owner": edge_owner,
+            "robber": topo.HEX_TO_IDX[state.board.robber_coordinate],
+            "hands": hands,
+            "vps": vps,
+            "current": state.current_player_index,
+            "turn": state.num_turns,
+            "winner": winner,
+        }
+
+    def _keyframe(self, snap, colors):
+        state = {
+            "layout": self._layout,
+            "colors": colors,
+            "node_owner": snap["node_owner"].tolist(),
+            "node_level": snap["node_level"].tolist(),
+            "edge_owner": snap["edge_owner"].tolist(),
+            "hands": [list(hand) for hand in snap["hands"]],
+            **{k: snap[k] for k in ("robber", "vps", "current", "turn", "winner")},
+        }
+        return {"type": "key", "game": self.game_id, "seq": self.seq, "state": state}
+
+    def reset(self, game):
+        """Keyframe of a new game."""
+        self.game_id = game.id
+        self.seq = 0
+        hex_resource, hex_number, port_resource = layout_from_catan_map(game.state.board.map)
+        self._layout = {
+            "hex_resource": hex_resource.tolist(),
+            "hex_number": hex_number.tolist(),
+            "port_resource": port_resource.tolist(),
+        }
+        self._colors = [color.value for color in game.state.colors]
+        players = range(len(game.state.colors))
+        self._keys = {
+            "cities": [f"P{p}_CITIES_AVAILABLE" for p in players],
+            "hands": [[f"P{p}_{r}_IN_HAND" for r in topo.RESOURCES] for p in players],
+            "vps": [f"P{p}_VICTORY_POINTS" for p in players],
+            "actual_vps": [f"P{p}_ACTUAL_VICTORY_POINTS" for p in players],
+        }
+        self._prev = self._capture(game)
+        return self._keyframe(self._prev, self._colors)
+
+    def end(self):
+        """End frame for the current game if it stopped before finishing, else None."""
+        if self.game_id is None or self._prev["winner"] is not None:
+            return None
+        self.seq += 1
+        frame = {"type": "end", "game": self.game_id, "seq": self.seq}
+        self.game_id = None
+        return frame
+
+    def keyframe(self, game):
+        """Keyframe of the current state (without advancing the sequence)."""
+        return self._keyframe(self._capture(game, self._prev), self._colors)
+
+    def step(self, game, action, actor):
+        """Frame for the step where seat `actor` played action index `action`."""
+        self.seq += 1
+        snap = self._capture(game, self._prev)
+        prev, self._prev = self._prev, snap
+
+        if self.seq % self.keyframe_interval == 0:
+            frame = self._keyframe(snap, self._colors)
+        else:
+            frame = {"type": "delta", "game": self.game_id, "seq": self.seq}
+            # _capture reuses the previous arrays when no piece was placed
+            if snap["node_owner"] is not prev["node_owner"]:
+                nodes = np.flatnonzero((snap["node_owner"] != prev["node_owner"]) | (snap["node_level"] != prev["node_level"]))
+                frame["buildings"] = [[int(n), int(snap["node_owner"][n]), int(snap["node_level"][n])] for n in nodes]
+            if snap["edge_owner"] is not prev["edge_owner"]:
+                edges = np.flatnonzero(snap["edge_owner"] != prev["edge_owner"])
+                frame["roads"] = [[int(e), int(snap["edge_owner"][e])] for e in edges]
+            hands = [[p, hand] for p, hand in enumerate(snap["hands"]) if hand != prev["hands"][p]]
+            if hands:
+                frame["hands"] = hands
+            for key in ("robber", "vps", "current", "turn", "winner"):
+                if snap[key] != prev[key]:
+                    frame[key] = snap[key]
+
+        frame["action"] = int(action)
+        frame["actor"] = int(actor)
+        if snap["winner"] is not None:
+            frame["done"] = True
+        return frame
+
+
+class UDPPublisher:
+    """
+    Fire-and-forget frame sender. Each frame is one datagram to the hub
+    server; a full socket buffer drops the frame instead of waiting.
+    """
+
+    def __init__(self, address):
+        if isinstance(address, str):
+            host, port = address.rsplit(":", 1)
+            address = (host, int(port))
+        self.address = address
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.dropped = 0
+
+    def publish(self, frame):
+        try:
+            self.sock.sendto(encode_frame(frame).encode(), self.address)
+        except OSError:  # BlockingIOError, or no server / network error
+            self.dropped += 1
+
+    def close(self):
+        self.sock.close()
+
+
+# ----------------------------------------------------------------------
+# Server side
+# ----------------------------------------------------------------------
+class HubClient:
+    """One spectator: a bounded queue of encoded frames."""
+
+    def __init__(self, queue_size):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.stale = set()  # games whose frames were dropped; resync with a keyframe
+        self.dropped = 0
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class BroadcastHub:
+    """
+    Keeps the full state of every live game and fans frames out to clients.
+
+    dispatch() and expire() must run on the hub's event loop; publish() may
+    be called from any thread. Nothing here ever waits on a client: a client
+    whose queue is full loses the frame and gets a keyframe of that game once
+    it has room again.
+    """
+
+    def __init__(self, queue_size=256, clock=time.monotonic):
+        self.queue_size = queue_size
+        self.games = {}  # game id -> full state
+        self.clients = set()
+        self._seq = {}
+        self._last_frame = {}  # game id -> clock() of its latest frame
+        self._clock = clock
+        self._loop = None
+
+    def bind(self, loop):
+        self._loop = loop
+
+    def publish(self, frame):
+        if self._loop is None:
+            self.dispatch(frame)
+        else:
+            self._loop.call_soon_threadsafe(self.dispatch, frame)
+
+    def _key_message(self, game_id):
+        return encode_frame({"type": "key", "game": game_id, "seq": self._seq[game_id], "state": self.games[game_id]})
+
+    def dispatch(self, frame):
+        game_id = frame["game"]
+        if frame["type"] == "key":
+            self.games[game_id] = frame["state"]
+        elif game_id in self.games and (frame["type"] == "end" or frame["seq"] == self._seq[game_id] + 1):
+            if frame["type"] == "delta":
+                apply_delta(self.games[game_id], frame)
+        else:
+            # Missed a frame of this game (or its start); wait for its next keyframe
+            self._drop(game_id)
+            return
+        self._seq[game_id] = frame["seq"]
+        self._last_frame[game_id] = self._clock()
+        self._broadcast(game_id, frame)
+        if frame.get("done") or frame["type"] == "end":
+            self._drop(game_id)
+
+    def expire(self, max_idle):
+        """Ends games that sent no frame for max_idle seconds (their env went away)."""
+        cutoff = self._clock() - max_idle
+        for game_id in [g for g, t in self._last_frame.items() if t < cutoff]:
+            self._broadcast(game_id, {"type": "end", "game": game_id, "seq": self._seq[game_id] + 1})
+            self._drop(game_id)
+
+    def _broadcast(self, game_id, frame):
+        message = encode_frame(frame)
+        key_message = None
+        for client in self.clients:
+            if client.queue.full():
+                client.dropped += 1
+                client.stale.add(game_id)
+            elif game_id in client.stale and frame["type"] == "delta":
+                key_message = key_message or self._key_message(game_id)
+                client.queue.put_nowait(key_message)
+                client.stale.discard(game_id)
+            else:
+                client.queue.put_nowait(message)
+                client.stale.discard(game_id)
+
+    def _drop(self, game_id):
+        self.games.pop(game_id, None)
+        self._seq.pop(game_id, None)
+        self._last_frame.pop(game_id, None)
+        for client in self.clients:
+            client.stale.discard(game_id)
+
+    def subscribe(self):
+        """New client, starting with keyframes of every live game (as many as fit)."""
+        client = HubClient(self.queue_size)
+        for game_id in self.games:
+            if client.queue.full():
+                client.stale.add(game_id)
+            else:
+                client.queue.put_nowait(self._key_message(game_id))
+        self.clients.add(client)
+        return client
+
+    def unsubscribe(self, client):
+        self.clients.discard(client)
+
+
+class _FrameReceiver(asyncio.DatagramProtocol):
+    def __init__(self, hub):
+        self.hub = hub
+
+    def datagram_received(self, data, addr):
+        try:
+            frame = json.loads(data)
+        except ValueError:
+            return
+        self.hub.dispatch(frame)
+
+
+def create_app(hub):
+    """FastAPI app streaming the hub's frames on /ws."""
+    from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+
+    app = FastAPI()
+
+    @app.websocket("/ws")
+    async def stream(websocket: WebSocket):
+        await websocket.accept()
+        client = hub.subscribe()
+        try:
+            while True:
+                await websocket.send_text(await client.get())
+        except WebSocketDisconnect:
+            pass
+        finally:
+            hub.unsubscribe(client)
+
+    return app
+
+
+async def _expire_idle_games(hub, idle_timeout):
+    while True:
+        await asyncio.sleep(idle_timeout / 4)
+        hub.expire(idle_timeout)
+
+
+async def serve(host="127.0.0.1", port=8000, udp_host="127.0.0.1", udp_port=DEFAULT_UDP_PORT, queue_size=256,
+                idle_timeout=DEFAULT_IDLE_TIMEOUT):
+    """Runs the websocket server and the UDP frame listener until stopped."""
+    import uvicorn
+
+    loop = asyncio.get_running_loop()
+    hub = BroadcastHub(queue_size)
+    hub.bind(loop)
+    transport, _ = await loop.create_datagram_endpoint(lambda: _FrameReceiver(hub), local_addr=(udp_host, udp_port))
+    expiry = asyncio.create_task(_expire_idle_games(hub, idle_timeout))
+    server = uvicorn.Server(uvicorn.Config(create_app(hub), host=host, port=port, log_level="warning"))
+    print(f"Streaming games from udp://{udp_host}:{udp_port} on ws://{host}:{port}/ws")
+    try:
+        await server.serve()
+    finally:
+        expiry.cancel()
+        transport.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Websocket hub for live CatanEnv games")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--udp-host", default="127.0.0.1")
+    parser.add_argument("--udp-port", type=int, default=DEFAULT_UDP_PORT)
+    parser.add_argument("--queue-size", type=int, default=256, help="Frames buffered per client before dropping")
+    parser.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT,
+                        help="Seconds without frames before a game is ended")
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.udp_host, args.udp_port, args.queue_size, args.idle_timeout))
@@ -0,0 +1,150 @@
+"""
+Static topology of the standard 4-player Catan board as NumPy arrays.
+
+Node ids, edge ordering and hex ordering match CatanEnv exactly:
+  - nodes are catanatron's land node ids 0-53
+  - edges are the 72 land edges as sorted (a, b) tuples, in sorted order
+  - hexes are the 19 land tile coordinates, in sorted order
+
+Only the assignment of resources / numbers / port types changes between
+games (see layout_pool.py), so everything here is computed once at import
+time.
+"""
+import numpy as np
+from catanatron.models.board import STATIC_GRAPH
+from catanatron.models.map import (
+    BASE_MAP_TEMPLATE,
+    PORT_DIRECTION_TO_NODEREFS,
+    CatanMap,
+    LandTile,
+    Port,
+)
+
+RESOURCES = ["WOOD", "BRICK", "SHEEP", "WHEAT", "ORE"]
+
+# Tile / port codes: 0 = desert (tiles) or 3:1 (ports), 1-5 = RESOURCES
+RESOURCE_CODES = {None: 0, "WOOD": 1, "BRICK": 2, "SHEEP": 3, "WHEAT": 4, "ORE": 5}
+
+N_NODES = 54
+N_EDGES = 72
+N_HEXES = 19
+N_PORTS = 9
+
+# Board template contents (as codes), shuffled per game
+TILE_RESOURCE_POOL = np.array([1] * 4 + [2] * 3 + [3] * 4 + [4] * 4 + [5] * 3 + [0], dtype=np.int8)
+NUMBER_POOL = np.array(BASE_MAP_TEMPLATE.numbers, dtype=np.int8)
+PORT_RESOURCE_POOL = np.array([RESOURCE_CODES[r] for r in BASE_MAP_TEMPLATE.port_resources], dtype=np.int8)
+
+
+def _build():
+    base_map = CatanMap.from_template(BASE_MAP_TEMPLATE)
+
+    # --- Hexes ---
+    hex_coords = sorted(base_map.land_tiles.keys())
+    hex_to_idx = {coord: i for i, coord in enumerate(hex_coords)}
+    # Land tiles in template order (the order catanatron deals resources/numbers)
+    template_hexes = np.array(
+        [hex_to_idx[c] for c, t in BASE_MAP_TEMPLATE.topology.items() if t == LandTile],
+        dtype=np.int64,
+    )
+
+    hex_nodes = np.zeros((N_HEXES, 6), dtype=np.int64)
+    for coord, tile in base_map.land_tiles.items():
+        hex_nodes[hex_to_idx[coord]] = sorted(tile.nodes.values())
+
+    # --- Edges ---
+    edge_set = set()
+    for tile in base_map.land_tiles.values():
+        for edge in tile.edges.values():
+            edge_set.add(tuple(sorted(edge)))
+    edge_list = sorted(edge_set)
+    edge_to_idx = {edge: i for i, edge in enumerate(edge_list)}
+    edge_nodes = np.array(edge_list, dtype=np.int64)
+
+    # --- Node adjacency (padded with N_NODES / N_EDGES / N_HEXES sentinels) ---
+    # Neighbors in catanatron's STATIC_GRAPH order, which decides how a cut
+    # road network is split (see BatchedCatanEngine._cut_road)
+    node_neighbors = np.full((N_NODES, 3), N_NODES, dtype=np.int64)
+    node_edges = np.full((N_NODES, 3), N_EDGES, dtype=np.int64)
+    for u in range(N_NODES):
+        neighbors = [v for v in STATIC_GRAPH.neighbors(u) if v < N_NODES]
+        node_neighbors[u, :len(neighbors)] = neighbors
+        node_edges[u, :len(neighbors)] = [edge_to_idx[tuple(sorted((u, v)))] for v in neighbors]
+
+    node_hexes = np.full((N_NODES, 3), N_HEXES, dtype=np.int64)
+    node_hex_count = np.zeros(N_NODES, dtype=np.int64)
+    node_hex_matrix = np.zeros((N_NODES, N_HEXES), dtype=np.float32)
+    for h in range(N_HEXES):
+        for n in hex_nodes[h]:
+            node_hexes[n, node_hex_count[n]] = h
+            node_hex_count[n] += 1
+            node_hex_matrix[n, h] = 1.0
+
+    # --- Ports (catanatron port id order) ---
+    port_nodes = np.zeros((N_PORTS, 2), dtype=np.int64)
+    port_coords = [None] * N_PORTS
+    for coord, tile in base_map.tiles.items():
+        if isinstance(tile, Port):
+            a_ref, b_ref = PORT_DIRECTION_TO_NODEREFS[tile.direction]
+            port_nodes[tile.id] = sorted((tile.nodes[a_ref], tile.nodes[b_ref]))
+            port_coords[tile.id] = coord
+
+    # --- Board observation slots ---
+    # CatanEnv fills its 19 board rows from the first 19 entries of
+    # sorted(board.map.tiles), which mixes land, port and water tiles.
+    # Each slot is (kind, index) with kind 0 = land (hex idx), 1 = port (port id), 2 = water.
+    port_to_id = {c: i for i, c in enumerate(port_coords)}
+    board_slots = []
+    for coord, tile in sorted(base_map.tiles.items())[:N_HEXES]:
+        if isinstance(tile, LandTile):
+            board_slots.append((0, hex_to_idx[coord]))
+        elif isinstance(tile, Port):
+            board_slots.append((1, port_to_id[coord]))
+        else:
+            board_slots.append((2, -1))
+    board_slots = np.array(board_slots, dtype=np.int64)
+
+    return dict(
+        hex_coords=hex_coords,
+        hex_to_idx=hex_to_idx,
+        template_hexes=template_hexes,
+        hex_nodes=hex_nodes,
+        edge_list=edge_list,
+        edge_to_idx=edge_to_idx,
+        edge_nodes=edge_nodes,
+        node_neighbors=node_neighbors,
+        node_edges=node_edges,
+        node_hexes=node_hexes,
+        node_hex_matrix=node_hex_matrix,
+        port_nodes=port_nodes,
+        port_coords=port_coords,
+        board_slots=board_slots,
+    )
+
+
+_T = _build()
+
+HEX_COORDS = _T["hex_coords"]            # list of 19 coords (== CatanEnv.hex_list)
+HEX_TO_IDX = _T["hex_to_idx"]
+TEMPLATE_HEXES = _T["template_hexes"]    # (19,) hex idx of each template land tile
+HEX_NODES = _T["hex_nodes"]              # (19, 6)
+EDGE_LIST = _T["edge_list"]              # list of 72 (a, b) tuples (== CatanEnv.edge_list)
+EDGE_TO_IDX = _T["edge_to_idx"]
+EDGE_NODES = _T["edge_nodes"]            # (72, 2)
+NODE_NEIGHBORS = _T["node_neighbors"]    # (54, 3), padded with N_NODES
+NODE_EDGES = _T["node_edges"]            # (54, 3), padded with N_EDGES
+NODE_HEXES = _T["node_hexes"]            # (54, 3), padded with N_HEXES
+NODE_HEX_MATRIX = _T["node_hex_matrix"]  # (54, 19) float incidence
+PORT_NODES = _T["port_nodes"]            # (9, 2)
+PORT_COORDS = _T["port_coords"]
+BOARD_SLOTS = _T["board_slots"]          # (19, 2) see _build
+
+# Board observation row showing each hex, -1 for hexes CatanEnv doesn't show
+HEX_BOARD_SLOT = np.full(N_HEXES, -1, dtype=np.int64)
+HEX_BOARD_SLOT[BOARD_SLOTS[BOARD_SLOTS[:, 0] == 0, 1]] = np.flatnonzero(BOARD_SLOTS[:, 0] == 0)
+
+# (neighbor, edge_idx) pairs per node, for Python-side graph walks
+NODE_LINKS = [
+    [(int(n), int(e)) for n, e in zip(NODE_NEIGHBORS[i], NODE_EDGES[i]) if e < N_EDGES]
+    for i in range(N_NODES)
+]
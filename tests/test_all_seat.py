@@ -0,0 +1,95 @@
+import unittest
+import numpy as np
+import sys
+import os
+from functools import partial
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from stable_baselines3.common.vec_env import DummyVecEnv
+from src.env.catan_env import CatanEnv
+from src.agent.train_ppo import DEFAULT_HPARAMS, build_model, env_config, make_env
+
+class TestAllSeat(unittest.TestCase):
+    def test_observation_is_seat_relative(self):
+        """Multi-agent obs are encoded for the acting seat, with owners rotated to it."""
+        env = CatanEnv({"multi_agent": True})
+        obs, info = env.reset(seed=1)
+        rng = np.random.default_rng(0)
+        for _ in range(300):
+            state = env.game.state
+            seat = info["seat"]
+            self.assertEqual(seat, state.current_player_index)
+            self.assertEqual(obs["globals"][0], state.player_state[f"P{seat}_VICTORY_POINTS"])
+            self.assertEqual(
+                list(obs["globals"][4:9]),
+                [state.player_state[f"P{seat}_{r}_IN_HAND"] for r in ["WOOD", "BRICK", "SHEEP", "WHEAT", "ORE"]],
+            )
+            for node, (color, _) in state.board.buildings.items():
+                channel = (state.color_to_index[color] - seat) % 4
+                self.assertEqual(obs["vertices"][node, 1 + channel] + obs["vertices"][node, 5 + channel], 1.0)
+
+            action = rng.choice(np.flatnonzero(env.get_valid_actions_mask()))
+            obs, reward, terminated, _, info = env.step(int(action))
+            self.assertEqual(info["seat_rewards"].shape, (4,))
+            if terminated:
+                break
+
+    def test_seat_rewards_track_victory_points(self):
+        """Summed per-seat rewards equal each seat's victory points, plus 10 for the winner."""
+        env = CatanEnv({"multi_agent": True})
+        env.reset(seed=0)
+        rng = np.random.default_rng(0)
+        totals = np.zeros(4)
+        for _ in range(5000):
+            state = env.game.state
+            # Only actions that execute (the mask also admits some that fail with -1);
+            # building whenever possible finishes the game
+            legal = [a for a in np.flatnonzero(env.get_valid_actions_mask())
+                     if env._map_action(int(a)) in state.playable_actions]
+            builds = [a for a in legal if a < 126]
+            action = rng.choice(builds if builds else legal)
+            _, _, terminated, _, info = env.step(int(action))
+            totals += info["seat_rewards"]
+            if terminated:
+                break
+        self.assertTrue(terminated)
+        state = env.game.state
+        expected = np.array([state.player_state[f"P{p}_VICTORY_POINTS"] for p in range(4)], dtype=np.float64)
+        expected[state.color_to_index[env.game.winning_color()]] += 10.0
+        np.testing.assert_array_equal(totals, expected)
+
+    def test_rollout_packs_every_seat(self):
+        """AllSeatMaskablePPO fills the usual n_steps x n_envs buffer from all seats."""
+        hparams = dict(DEFAULT_HPARAMS, n_envs=2, n_steps=32, batch_size=32, net_arch=[32], all_seats=True)
+        vec_env = DummyVecEnv([partial(make_env, env_config(hparams)) for _ in range(2)])
+        model = build_model(vec_env, hparams, seed=0, device="cpu")
+        _, callback = model._setup_learn(1000)
+        self.assertTrue(model.collect_rollouts(model.env, callback, model.rollout_buffer, model.n_steps))
+
+        buffer = model.rollout_buffer
+        self.assertEqual(buffer.rewards.shape, (32, 2))
+        # Every seat's first decision starts its episode; settlements earn VPs
+        self.assertGreaterEqual(buffer.episode_starts.sum(), 8)
+        self.assertGreaterEqual(buffer.rewards.sum(), 8)
+        np.testing.assert_allclose(buffer.returns, buffer.advantages + buffer.values, rtol=1e-5)
+        vec_env.close()
+
+    def test_rollouts_stay_on_budget(self):
+        """Each rollout costs about n_steps env steps per env and carries no backlog."""
+        hparams = dict(DEFAULT_HPARAMS, n_envs=2, n_steps=64, batch_size=64, net_arch=[32], all_seats=True)
+        vec_env = DummyVecEnv([partial(make_env, env_config(hparams)) for _ in range(2)])
+        model = build_model(vec_env, hparams, seed=0, device="cpu")
+        _, callback = model._setup_learn(10000)
+        for _ in range(5):
+            before = model.num_timesteps
+            self.assertTrue(model.collect_rollouts(model.env, callback, model.rollout_buffer, model.n_steps))
+            # At most each seat's still-open decision goes uncounted
+            self.assertLessEqual(model.num_timesteps - before, (64 + 4) * 2)
+            self.assertEqual(sum(len(column) for column in model._columns), 0)
+            self.assertLessEqual(sum(p is not None for p in model._pending), 8)
+        vec_env.close()
+
+if __name__ == '__main__':
+    unittest.main()
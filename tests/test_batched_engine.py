@@ -0,0 +1,100 @@
+import unittest
+import numpy as np
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.env.catan_env import CatanEnv
+from src.env import topology
+from src.env.batched_engine import BatchedCatanEngine, BatchedCatanEnv, BatchedVecEnv
+from src.env.engine_replay import replay_random_games
+
+class TestBatchedEngine(unittest.TestCase):
+    def test_topology_matches_env(self):
+        """Precomputed edge / hex ordering matches CatanEnv's."""
+        env = CatanEnv()
+        self.assertEqual(topology.EDGE_LIST, env.edge_list)
+        self.assertEqual(topology.HEX_COORDS, env.hex_list)
+
+    def test_observation_layout(self):
+        """Batched observations have CatanEnv's shapes with a batch dimension."""
+        env = BatchedCatanEnv(4, seed=0)
+        obs, infos = env.reset()
+        self.assertEqual(obs["board"].shape, (4, 19, 17))
+        self.assertEqual(obs["vertices"].shape, (4, 54, 15))
+        self.assertEqual(obs["edges"].shape, (4, 72, 5))
+        self.assertEqual(obs["globals"].shape, (4, 59))
+        self.assertEqual(len(infos), 4)
+
+    def test_initial_mask(self):
+        """Every game starts with all 54 settlement spots open and nothing else."""
+        engine = BatchedCatanEngine(3, seed=0)
+        engine.reset()
+        mask = engine.action_masks()
+        self.assertEqual(mask.shape, (3, 202))
+        self.assertTrue((mask[:, :54] == 1).all())
+        self.assertEqual(mask[:, 54:].sum(), 0)
+
+    def test_illegal_action_is_noop(self):
+        """Illegal actions are rejected with -1 reward and leave state untouched."""
+        env = BatchedCatanEnv(2, seed=0)
+        env.reset()
+        before = env.engine.node_owner.copy()
+        obs, rewards, terminated, truncated, infos = env.step(np.array([201, 201]))
+        np.testing.assert_array_equal(rewards, [-1.0, -1.0])
+        np.testing.assert_array_equal(env.engine.node_owner, before)
+
+    def test_random_play_auto_resets(self):
+        """Random legal play runs without errors and resets finished games."""
+        env = BatchedCatanEnv(8, config={"max_turns": 50}, seed=0)
+        env.reset()
+        rng = np.random.default_rng(0)
+        finished = 0
+        for _ in range(2000):
+            mask = env.get_valid_actions_mask()
+            self.assertTrue((mask.sum(axis=1) > 0).all())
+            actions = np.argmax(np.where(mask == 1, rng.random(mask.shape), -1.0), axis=1)
+            obs, rewards, terminated, truncated, infos = env.step(actions)
+            self.assertTrue((rewards > -1).all())
+            finished += int((terminated | truncated).sum())
+        self.assertGreater(finished, 0)
+        self.assertTrue((env.engine.bank >= 0).all())
+        self.assertTrue((env.engine.hands >= 0).all())
+
+    def test_vec_env_trains_maskable_ppo(self):
+        """BatchedVecEnv exposes per-game masks and trains MaskablePPO."""
+        from stable_baselines3.common.vec_env import VecMonitor
+        from src.agent.train_ppo import DEFAULT_HPARAMS, build_model
+
+        env = VecMonitor(BatchedVecEnv(4, config={"max_turns": 5}, seed=0))
+        env.reset()
+        masks = env.env_method("action_masks")
+        self.assertEqual(len(masks), 4)
+        self.assertEqual(masks[0].shape, (202,))
+        self.assertTrue(env.has_attr("action_masks"))
+
+        hparams = dict(DEFAULT_HPARAMS, n_envs=4, n_steps=64, batch_size=64, net_arch=[16])
+        model = build_model(env, hparams, seed=0, device="cpu")
+        model.learn(total_timesteps=256)
+        self.assertEqual(model.num_timesteps, 256)
+        self.assertGreater(len(model.ep_info_buffer), 0)
+
+    def test_replay_matches_catanatron(self):
+        """Replaying catanatron games step by step yields identical state, masks and observations."""
+        mismatches, steps = replay_random_games(n_games=4, max_steps=1500, seed=0, env=CatanEnv())
+        self.assertGreater(steps, 0)
+        self.assertEqual(mismatches, [])
+
+        mismatches, steps = replay_random_games(n_games=12, max_steps=1000, seed=1)
+        self.assertEqual(mismatches, [])
+
+    def test_replay_road_cuts(self):
+        """Games where a settlement cuts a road and catanatron's longest road starts at an enemy node."""
+        for seed, games in [(12, [6, 17]), (13, [14])]:
+            mismatches, _ = replay_random_games(max_steps=1700, seed=seed, games=games)
+            self.assertEqual(mismatches, [])
+
+if __name__ == '__main__':
+    unittest.main()
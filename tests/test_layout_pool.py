@@ -0,0 +1,108 @@
+import unittest
+import numpy as np
+import sys
+import os
+import tempfile
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.env.catan_env import CatanEnv
+from src.env.batched_engine import BatchedCatanEnv
+from src.env.layout_pool import LayoutPool, layout_from_catan_map
+
+class TestLayoutPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = LayoutPool.generate(20, seed=3)
+
+    def test_generation_is_seeded(self):
+        """The same seed gives the same pool, a different seed a different one."""
+        same = LayoutPool.generate(20, seed=3)
+        other = LayoutPool.generate(20, seed=4)
+        np.testing.assert_array_equal(same.hex_resource, self.pool.hex_resource)
+        np.testing.assert_array_equal(same.port_resource, self.pool.port_resource)
+        self.assertFalse(np.array_equal(other.hex_resource, self.pool.hex_resource))
+
+    def test_save_load_round_trip(self):
+        """Layouts and cached features survive a save / load."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "pool.npz")
+            self.pool.save(path)
+            loaded = LayoutPool.load(path)
+        self.assertEqual(len(loaded), 20)
+        self.assertEqual(loaded.seed, 3)
+        np.testing.assert_array_equal(loaded.hex_number, self.pool.hex_number)
+        for k, v in self.pool.features.items():
+            np.testing.assert_array_equal(loaded.features[k], v)
+
+    def test_catan_map_round_trip(self):
+        """Each layout's catanatron map converts back to the same arrays."""
+        for i in range(len(self.pool)):
+            for got, want in zip(layout_from_catan_map(self.pool.catan_map(i)), self.pool.layouts(i)):
+                np.testing.assert_array_equal(got, want)
+
+    def test_vertex_pips(self):
+        """Pips count the dice dots of each adjacent hex's resource."""
+        pips = self.pool.features["vertex_pips"]
+        self.assertEqual(pips.shape, (20, 54, 5))
+        # 18 numbered hexes with 58 dots in total, each touching 6 vertices
+        np.testing.assert_array_equal(pips.sum(axis=(1, 2)), np.full(20, 58 * 6))
+
+    def test_env_uses_cached_features(self):
+        """CatanEnv plays pool layouts and its static obs match the cached features."""
+        env = CatanEnv({"layout_pool": self.pool})
+        for i in (0, 7, 19):
+            obs, _ = env.reset(seed=i, options={"layout": i})
+            self.assertEqual(env.layout_id, i)
+            features = self.pool.layout_features(i)
+            np.testing.assert_array_equal(obs["board"][:, :16], features["board"][:, :16])
+            np.testing.assert_array_equal(obs["vertices"][:, 9:], features["vertex_ports"])
+
+    def test_seeded_reset_is_reproducible(self):
+        """Same seed -> same board, seating and dice for the same actions."""
+        def play(seed):
+            env = CatanEnv()
+            obs, _ = env.reset(seed=seed)
+            trace = [obs["board"].copy()]
+            rng = np.random.default_rng(0)
+            for _ in range(200):
+                action = rng.choice(np.flatnonzero(env.get_valid_actions_mask()))
+                obs, _, terminated, _, _ = env.step(int(action))
+                trace.append(obs["globals"].copy())
+                if terminated:
+                    break
+            return env.game.state.colors, trace
+
+        colors_a, trace_a = play(11)
+        colors_b, trace_b = play(11)
+        self.assertEqual(colors_a, colors_b)
+        self.assertEqual(len(trace_a), len(trace_b))
+        for a, b in zip(trace_a, trace_b):
+            np.testing.assert_array_equal(a, b)
+
+    def test_sampling_modes(self):
+        """Fixed mode always picks its index; curriculum starts on a prefix of the pool."""
+        env = CatanEnv({"layout_pool": self.pool, "layout_mode": "fixed", "layout_index": 5})
+        env.reset(seed=0)
+        for _ in range(3):
+            env.reset()
+            self.assertEqual(env.layout_id, 5)
+
+        rng = np.random.default_rng(0)
+        early = self.pool.sample(rng, "curriculum", size=200, progress=0.0, start_fraction=0.25)
+        late = self.pool.sample(rng, "curriculum", size=200, progress=1.0, start_fraction=0.25)
+        self.assertLess(early.max(), 5)
+        self.assertGreaterEqual(late.max(), 5)
+        with self.assertRaises(ValueError):
+            CatanEnv({"layout_pool": self.pool, "layout_mode": "sorted"})
+
+    def test_batched_env_uses_pool(self):
+        """BatchedCatanEnv deals pool layouts with the pool's cached board rows."""
+        env = BatchedCatanEnv(4, config={"layout_pool": self.pool}, seed=0)
+        obs, _ = env.reset()
+        for row, i in enumerate(env.layout_ids):
+            np.testing.assert_array_equal(obs["board"][row, :, :16], self.pool.features["board"][i, :, :16])
+            np.testing.assert_array_equal(env.engine.hex_resource[row], self.pool.hex_resource[i])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import unittest
+import numpy as np
+import sys
+import os
+import tempfile
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from catanatron import Game, Color
+from catanatron.models.player import Player
+from stable_baselines3.common.vec_env import DummyVecEnv
+from src.env.catan_env import CatanEnv
+from src.env.layout_pool import LayoutPool, layout_from_catan_map
+from src.env.opening_book import (
+    OpeningBook,
+    build_book,
+    combined_scores,
+    layout_hash,
+    play_setup,
+    policy_value_scores,
+)
+from src.agent.train_ppo import DEFAULT_HPARAMS, build_model, make_env
+
+def new_game(seed):
+    return Game([Player(c) for c in [Color.RED, Color.BLUE, Color.WHITE, Color.ORANGE]], seed=seed)
+
+class TestOpeningBook(unittest.TestCase):
+    def setUp(self):
+        self.pool = LayoutPool.generate(5, seed=0)
+
+    def test_layout_hash(self):
+        """Hashes are stable per layout and differ between layouts."""
+        hashes = [layout_hash(*self.pool.layouts(i)) for i in range(len(self.pool))]
+        self.assertEqual(len(set(hashes)), len(self.pool))
+        self.assertEqual(hashes[2], layout_hash(*LayoutPool.generate(5, seed=0).layouts(2)))
+
+    def test_disk_index_round_trip(self):
+        """Entries are written once per layout hash and read back by a new book."""
+        with tempfile.TemporaryDirectory() as tmp:
+            build_book(OpeningBook(tmp), self.pool)
+            self.assertEqual(len(os.listdir(tmp)), len(self.pool))
+
+            reopened = OpeningBook(tmp)
+            key = layout_hash(*self.pool.layouts(3))
+            entry = reopened.lookup(key)
+            self.assertIsNotNone(entry)
+            np.testing.assert_array_equal(entry["score"], OpeningBook().entry(*self.pool.layouts(3))["score"])
+
+    def test_env_saves_only_pool_layouts(self):
+        """Random boards are scored in memory; pool layouts go to the book directory."""
+        with tempfile.TemporaryDirectory() as tmp:
+            env = CatanEnv({"opening_book": tmp})
+            for seed in range(5):
+                env.reset(seed=seed)
+            self.assertEqual(os.listdir(tmp), [])
+            self.assertEqual(len(env.opening_book._cache), 5)
+
+            env = CatanEnv({"opening_book": tmp, "opening_mode": "features", "layout_pool": self.pool})
+            for seed in range(5):
+                env.reset(seed=seed, options={"layout": seed % 2})
+            self.assertEqual(len(os.listdir(tmp)), 2)
+
+    def test_scores_favor_production(self):
+        """Vertices touching no numbered hex never outscore the best spot."""
+        entry = OpeningBook().entry(*self.pool.layouts(0))
+        self.assertEqual(entry["score"].shape, (54,))
+        barren = self.pool.features["vertex_pips"][0].sum(axis=1) == 0
+        self.assertLess(entry["score"][barren].max(initial=0), entry["score"].max())
+
+    def test_play_setup(self):
+        """The book plays a complete, legal setup phase, starting on its best spot."""
+        book = OpeningBook()
+        game = new_game(seed=5)
+        scores = combined_scores(book.entry_for_map(game.state.board.map))
+        play_setup(game, book)
+        state = game.state
+        self.assertFalse(state.is_initial_build_phase)
+        self.assertEqual(len(state.board.buildings), 8)
+        self.assertEqual(len(state.board.roads), 16)  # both directions of 8 roads
+        self.assertIn(int(np.argmax(scores)), state.board.buildings)
+
+        replay = new_game(seed=5)
+        play_setup(replay, book)
+        self.assertEqual(dict(replay.state.board.buildings), dict(state.board.buildings))
+
+    def test_env_auto_setup(self):
+        """With opening_mode "auto", episodes start after the setup phase."""
+        env = CatanEnv({"opening_book": True, "layout_pool": self.pool})
+        obs, _ = env.reset(seed=0)
+        self.assertFalse(env.game.state.is_initial_build_phase)
+        self.assertEqual(env.get_valid_actions_mask()[:126].sum(), 0)
+        self.assertEqual(env._last_vp, 2)
+        self.assertEqual(obs["vertices"][:, 1:9].sum(), 8)
+
+    def test_env_score_features(self):
+        """With opening_mode "features", book scores are an extra vertex channel."""
+        env = CatanEnv({"opening_book": True, "opening_mode": "features"})
+        obs, _ = env.reset(seed=0)
+        self.assertEqual(env.observation_space["vertices"].shape, (54, 16))
+        self.assertEqual(obs["vertices"].shape, (54, 16))
+        self.assertTrue(env.game.state.is_initial_build_phase)
+        scores = obs["vertices"][:, 15]
+        self.assertAlmostEqual(float(scores.max()), 1.0)
+        self.assertGreaterEqual(float(scores.min()), 0.0)
+        entry = env.opening_book.entry(*layout_from_catan_map(env.game.state.board.map))
+        self.assertEqual(int(np.argmax(scores)), int(np.argmax(entry["score"])))
+
+    def test_policy_value_scores(self):
+        """A model's first-settlement policy and values cover the legal spots."""
+        hparams = dict(DEFAULT_HPARAMS, n_envs=1, n_steps=16, batch_size=16, net_arch=[16])
+        model = build_model(DummyVecEnv([make_env]), hparams, seed=0, device="cpu")
+        env = CatanEnv({"layout_pool": self.pool})
+        env.reset(seed=0, options={"layout": 1})
+        game = env.game
+        policy, value = policy_value_scores(model, env)
+        self.assertIs(env.game, game)
+        self.assertAlmostEqual(float(policy.sum()), 1.0, places=4)
+        self.assertEqual(value.shape, (54,))
+
+        book = build_book(OpeningBook(), self.pool, model)
+        entry = book.entry(*self.pool.layouts(1))
+        self.assertIn("policy", entry)
+        self.assertEqual(combined_scores(entry).shape, (54,))
+
+if __name__ == '__main__':
+    unittest.main()
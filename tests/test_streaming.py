@@ -0,0 +1,169 @@
+import unittest
+import copy
+import json
+import socket
+import numpy as np
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.env.catan_env import CatanEnv
+from src.env.streaming import BroadcastHub, UDPPublisher, apply_delta
+
+class FrameRecorder:
+    def __init__(self):
+        self.frames = []
+
+    def publish(self, frame):
+        self.frames.append(copy.deepcopy(frame))
+
+def play(env, steps, seed=0):
+    env.reset(seed=seed)
+    rng = np.random.default_rng(seed)
+    for _ in range(steps):
+        action = rng.choice(np.flatnonzero(env.get_valid_actions_mask()))
+        _, _, terminated, _, _ = env.step(int(action))
+        if terminated:
+            break
+
+class TestStreaming(unittest.TestCase):
+    def test_deltas_rebuild_full_state(self):
+        """Applying each frame as it arrives tracks the game's full state."""
+        recorder = FrameRecorder()
+        env = CatanEnv({"stream": recorder, "stream_keyframe_interval": 50})
+        env.reset(seed=0)
+        self.assertEqual(recorder.frames[0]["type"], "key")
+        state = copy.deepcopy(recorder.frames[0]["state"])
+        rng = np.random.default_rng(0)
+        for step in range(1, 400):
+            action = rng.choice(np.flatnonzero(env.get_valid_actions_mask()))
+            _, _, terminated, _, _ = env.step(int(action))
+            frame = recorder.frames[step]
+            self.assertEqual(frame["action"], action)
+            if frame["type"] == "key":
+                self.assertEqual(frame["seq"] % 50, 0)
+                state = copy.deepcopy(frame["state"])
+            else:
+                self.assertNotIn("layout", frame)
+                apply_delta(state, frame)
+            self.assertEqual(state, env._stream_encoder.keyframe(env.game)["state"])
+            if terminated:
+                break
+
+    def test_slow_client_drops_and_resyncs(self):
+        """A full client queue drops frames, then resumes from a keyframe."""
+        recorder = FrameRecorder()
+        env = CatanEnv({"stream": recorder, "stream_keyframe_interval": 1000})
+        play(env, 60)
+
+        hub = BroadcastHub(queue_size=4)
+        hub.dispatch(recorder.frames[0])
+        fast, slow = hub.subscribe(), hub.subscribe()
+        self.assertEqual(json.loads(slow.queue.get_nowait())["type"], "key")
+        for frame in recorder.frames[1:31]:
+            hub.dispatch(frame)
+            while not fast.queue.empty():
+                fast.queue.get_nowait()
+        self.assertEqual(slow.queue.qsize(), 4)
+        self.assertGreater(slow.dropped, 0)
+        self.assertEqual(fast.dropped, 0)
+
+        while not slow.queue.empty():
+            slow.queue.get_nowait()
+        hub.dispatch(recorder.frames[31])
+        resync = json.loads(slow.queue.get_nowait())
+        self.assertEqual(resync["type"], "key")
+        self.assertEqual(resync["seq"], recorder.frames[31]["seq"])
+        game_id = recorder.frames[0]["game"]
+        self.assertEqual(resync["state"], json.loads(json.dumps(hub.games[game_id])))
+
+    def test_hub_tracks_live_games(self):
+        """New clients get keyframes of live games; gaps and finished games are dropped."""
+        recorder = FrameRecorder()
+        env = CatanEnv({"stream": recorder})
+        play(env, 20)
+        hub = BroadcastHub()
+        hub.dispatch(recorder.frames[0])
+        hub.dispatch(recorder.frames[2])  # frame 1 lost in transit
+        self.assertEqual(hub.games, {})
+
+        hub.dispatch(recorder.frames[0])
+        hub.dispatch(dict(recorder.frames[1], done=True))
+        self.assertEqual(hub.games, {})
+        hub.dispatch(recorder.frames[0])
+        client = hub.subscribe()
+        self.assertEqual(client.queue.qsize(), 1)
+
+    def test_abandoned_games_end(self):
+        """Games left without a winner end on reset, close or idle expiry."""
+        recorder = FrameRecorder()
+        env = CatanEnv({"stream": recorder})
+        play(env, 20)
+        first = recorder.frames[0]["game"]
+        env.reset(seed=1)
+        end = recorder.frames[-2]
+        self.assertEqual((end["type"], end["game"], end["seq"]), ("end", first, recorder.frames[-3]["seq"] + 1))
+        second_key = recorder.frames[-1]
+        self.assertEqual(second_key["type"], "key")
+        second = second_key["game"]
+        env.close()
+        self.assertEqual((recorder.frames[-1]["type"], recorder.frames[-1]["game"]), ("end", second))
+        env.close()
+        self.assertEqual(recorder.frames[-1]["game"], second)
+
+        now = [0.0]
+        hub = BroadcastHub(clock=lambda: now[0])
+        client = hub.subscribe()
+        for frame in recorder.frames:
+            hub.dispatch(frame)
+        self.assertEqual((hub.games, hub._seq, hub._last_frame), ({}, {}, {}))
+        messages = [json.loads(client.queue.get_nowait()) for _ in range(client.queue.qsize())]
+        self.assertEqual([m["type"] for m in messages].count("end"), 2)
+
+        # A gap forgets the game entirely
+        hub.dispatch(recorder.frames[0])
+        hub.dispatch(recorder.frames[2])
+        self.assertEqual((hub.games, hub._seq), ({}, {}))
+
+        hub.dispatch(recorder.frames[0])
+        now[0] = 100.0
+        hub.dispatch(second_key)
+        hub.expire(60)
+        self.assertEqual(list(hub.games), [second])
+        messages = [json.loads(client.queue.get_nowait()) for _ in range(client.queue.qsize())]
+        self.assertEqual(messages[-1], {"type": "end", "game": first, "seq": 1})
+
+    def test_stream_every_n_games(self):
+        """Only every nth game is streamed, and each streamed game ends once."""
+        recorder = FrameRecorder()
+        env = CatanEnv({"stream": recorder, "stream_every_n_games": 3})
+        games = []
+        for seed in range(7):
+            play(env, 10, seed=seed)
+            games.append(env.game.id)
+        env.close()
+        streamed = [frame["game"] for frame in recorder.frames]
+        self.assertEqual(sorted(set(streamed)), sorted([games[0], games[3], games[6]]))
+        self.assertEqual(len(recorder.frames), 3 * 12)  # keyframe, 10 steps, end
+        self.assertEqual([f["type"] for f in recorder.frames].count("end"), 3)
+
+    def test_udp_publish_never_blocks(self):
+        """Publishing works with or without a listening hub."""
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        receiver.bind(("127.0.0.1", 0))
+        receiver.settimeout(5)
+        env = CatanEnv({"stream": "127.0.0.1:%d" % receiver.getsockname()[1]})
+        env.reset(seed=0)
+        frame = json.loads(receiver.recv(65536))
+        self.assertEqual(frame["type"], "key")
+        receiver.close()
+
+        publisher = UDPPublisher(("127.0.0.1", 9))
+        for _ in range(10):
+            publisher.publish({"type": "delta", "game": "x", "seq": 1})
+        publisher.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+import concurrent.futures
+import random
+import tempfile
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.agent.sweep import (
+    DEFAULT_SEARCH_SPACE,
+    ResultsStore,
+    parse_args,
+    reward_slope,
+    run_sweep,
+    rung_budgets,
+    sample_config,
+    select_survivors,
+    trial_cores,
+)
+
+class TestSweep(unittest.TestCase):
+    def test_sample_config(self):
+        """Sampled configs stay inside the search space."""
+        rng = random.Random(0)
+        for _ in range(50):
+            config = sample_config(DEFAULT_SEARCH_SPACE, rng)
+            self.assertIn(config["n_envs"], DEFAULT_SEARCH_SPACE["n_envs"][1])
+            self.assertTrue(1e-5 <= config["learning_rate"] <= 1e-3)
+            self.assertLessEqual(config["batch_size"], config["n_steps"] * config["n_envs"])
+
+    def test_env_cap_keeps_batch_in_rollout(self):
+        """Capping n_envs happens before batch_size is clamped to the rollout."""
+        rng = random.Random(0)
+        for _ in range(200):
+            config = sample_config(DEFAULT_SEARCH_SPACE, rng, max_envs=1)
+            self.assertEqual(config["n_envs"], 1)
+            self.assertLessEqual(config["batch_size"], config["n_steps"])
+        self.assertEqual(trial_cores({"n_envs": 1}), 1)
+        self.assertEqual(trial_cores({"n_envs": 4}), 5)
+
+    def test_unknown_space_type(self):
+        with self.assertRaises(ValueError):
+            sample_config({"gamma": ["normal", 0.99, 0.01]}, random.Random(0))
+
+    def test_successive_halving(self):
+        """Budgets grow by eta and only the top 1/eta trials survive."""
+        self.assertEqual(rung_budgets(100, 3, 3), [100, 300, 900])
+        results = {t: {"score": float(t)} for t in range(9)}
+        results[8]["score"] = float("-inf")  # failed trial
+        self.assertEqual(select_survivors(results, 3), [7, 6, 5])
+
+    def test_ties_use_reward_curve(self):
+        """Trials tied on win rate (and without episode rewards) are ranked by their reward curve."""
+        self.assertIsNone(reward_slope([0.1]))
+        self.assertAlmostEqual(reward_slope([0.0, 0.5, 1.0]), 0.5)
+        results = {t: {"score": 0.0, "win_rate": 0.0, "mean_reward": None,
+                       "rollout_reward": 0.01 * ((t * 5) % 9), "reward_slope": None} for t in range(9)}
+        self.assertEqual(select_survivors(results, 3), [7, 5, 3])
+
+        # Complete ties are broken by the rng, not by trial id
+        tied = {t: {"score": 0.0} for t in range(9)}
+        picks = {tuple(select_survivors(tied, 3, random.Random(seed))) for seed in range(10)}
+        self.assertGreater(len(picks), 1)
+
+    def test_results_store(self):
+        with tempfile.TemporaryDirectory() as out:
+            store = ResultsStore(os.path.join(out, "trials.jsonl"))
+            store.append({"trial": 0, "rung": 0, "score": 0.5})
+            store.append({"trial": 1, "rung": 1, "score": 0.2})
+            self.assertEqual(len(store.load()), 2)
+            self.assertEqual(store.best()["trial"], 1)
+
+    def test_run_sweep_prunes(self):
+        """A full sweep with a fake trial function prunes the weaker trials."""
+        calls = []
+        seeds = []
+        pools = set()
+
+        def fake_trial(trial_id, config, timesteps, trial_dir, eval_games, seed, eval_seed, layout_pool):
+            calls.append((trial_id, timesteps))
+            seeds.append((seed, eval_seed))
+            pools.add(layout_pool)
+            return {"trial": trial_id, "timesteps": timesteps,
+                    "win_rate": config["learning_rate"], "mean_reward": None}
+
+        with tempfile.TemporaryDirectory() as out:
+            args = parse_args(["--trials", "9", "--rungs", "3", "--min-timesteps", "10",
+                               "--cores", "8", "--layout-pool", "layouts.npz", "--out", out])
+            run_sweep(args, DEFAULT_SEARCH_SPACE,
+                      executor=concurrent.futures.ThreadPoolExecutor(2), trial_fn=fake_trial)
+            records = ResultsStore(os.path.join(out, "trials.jsonl")).load()
+
+        # 9 trials -> 3 -> 1
+        self.assertEqual(len(calls), 9 + 3 + 1)
+        # Models are seeded per trial, evaluation games are shared
+        self.assertEqual(len({seed for seed, _ in seeds[:9]}), 9)
+        self.assertEqual({eval_seed for _, eval_seed in seeds}, {args.seed})
+        self.assertEqual(pools, {"layouts.npz"})
+        self.assertEqual(sorted(r["budget"] for r in records if r["rung"] == 1), [30, 30, 30])
+        self.assertEqual(sum(r["status"] == "pruned" for r in records), 6 + 2)
+        # The survivor of every rung is the trial with the highest learning rate
+        best = max(records, key=lambda r: r["config"]["learning_rate"])
+        self.assertEqual([r["status"] for r in records if r["trial"] == best["trial"]],
+                         ["promoted", "promoted", "completed"])
+
+    def test_best_trial_runs_every_rung(self):
+        """With no more trials than eta, the best one still gets every budget."""
+        calls = []
+
+        def fake_trial(trial_id, config, timesteps, trial_dir, eval_games, seed, eval_seed, layout_pool):
+            calls.append((trial_id, timesteps))
+            return {"trial": trial_id, "timesteps": timesteps, "win_rate": 0.0, "mean_reward": None,
+                    "rollout_reward": config["learning_rate"]}
+
+        with tempfile.TemporaryDirectory() as out:
+            args = parse_args(["--trials", "3", "--rungs", "3", "--min-timesteps", "10",
+                               "--cores", "8", "--out", out])
+            run_sweep(args, DEFAULT_SEARCH_SPACE,
+                      executor=concurrent.futures.ThreadPoolExecutor(2), trial_fn=fake_trial)
+            best = ResultsStore(os.path.join(out, "trials.jsonl")).best()
+
+        self.assertEqual(len(calls), 3 + 1 + 1)
+        self.assertEqual(best["budget"], 90)
+        self.assertEqual([t for t, budget in calls if budget == 90], [best["trial"]])
+
+if __name__ == '__main__':
+    unittest.main()